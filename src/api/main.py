@@ -4,32 +4,41 @@ FastAPI main application with REST endpoints for workflow execution.
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional, List, Tuple
 import asyncio
-import json
+import logging
+import os
+import orjson
 import structlog
 from ..core.workflow_engine import WorkflowEngine, ExecutionResult
 from ..core.config_loader import config_loader
 from ..core.prompt_manager import prompt_manager
+from ..tools.base import tool_registry
+from ..observability.logging import render_exception_details
 
-# Configure structured logging
+
+def _decode_json_bytes(logger, method_name, event_dict):
+    """Decode orjson output so stdlib logging handlers receive text."""
+    if isinstance(event_dict, bytes):
+        return event_dict.decode("utf-8")
+    return event_dict
+
+
+# Configure structured logging; events below INFO are dropped before any processor runs
 structlog.configure(
     processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+        render_exception_details,
+        structlog.processors.JSONRenderer(serializer=orjson.dumps),
+        _decode_json_bytes
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
+    wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
     cache_logger_on_first_use=True,
 )
 
@@ -53,39 +62,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global workflow engine
-workflow_engine = None
+# Serialized config responses keyed by (kind, id), invalidated on file mtime change
+_config_response_cache: Dict[Tuple[str, str], Tuple[int, bytes]] = {}
+
+
+def _cached_json_response(key: Tuple[str, str], path: Path, build: Callable[[], Any]) -> Response:
+    """Return the cached JSON body for a config path, rebuilding it when the path changes."""
+    mtime = path.stat().st_mtime_ns
+    cached = _config_response_cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, orjson.dumps(build()))
+        _config_response_cache[key] = cached
+    return Response(content=cached[1], media_type="application/json")
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application on startup."""
-    global workflow_engine
-    
     # Initialize workflow engine
-    import os
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
         raise ValueError("OPENAI_API_KEY environment variable is required")
     
-    workflow_engine = WorkflowEngine(openai_api_key)
+    # Parse all configs up front so requests start from a warm cache
+    await asyncio.to_thread(config_loader.preload_all)
+    await asyncio.to_thread(prompt_manager.precompile_all)
+    
+    # Per-worker state; execution results live in the worker that ran them
+    app.state.workflow_engine = WorkflowEngine(openai_api_key)
     logger.info("Enterprise GenAI Platform started")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release tool connections on shutdown."""
+    # Tools such as APITool hold their own connection pools
+    for tool in tool_registry.tools.values():
+        try:
+            await tool.close()
+        except Exception as e:
+            logger.error("Failed to close tool", tool=tool.get_name(), error=str(e))
+
+
 # Pydantic models
 class WorkflowExecutionRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     workflow_id: str
     input_data: Dict[str, Any]
     execution_id: Optional[str] = None
 
 
 class AgentExecutionRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     agent_id: str
     input_data: Dict[str, Any]
     execution_id: Optional[str] = None
 
 
 class ExecutionResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     execution_id: str
     status: str
     output: Optional[Any] = None
@@ -94,6 +132,29 @@ class ExecutionResponse(BaseModel):
     token_usage: Dict[str, int]
 
 
+# Serializes straight to JSON bytes, skipping FastAPI's jsonable_encoder pass
+_execution_response_adapter = TypeAdapter(ExecutionResponse)
+
+
+def _execution_response(result: ExecutionResult) -> Response:
+    """Build the API response for an execution, reusing its pre-encoded body once final."""
+    if result.encoded_response is not None:
+        return Response(content=result.encoded_response, media_type="application/json")
+    
+    response = ExecutionResponse(
+        execution_id=result.execution_id,
+        status=result.status.value,
+        output=result.output,
+        error=result.error,
+        execution_time_ms=result.execution_time_ms,
+        token_usage=result.token_usage
+    )
+    return Response(
+        content=_execution_response_adapter.dump_json(response),
+        media_type="application/json"
+    )
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -106,55 +167,58 @@ async def health_check():
 async def execute_workflow(request: WorkflowExecutionRequest):
     """Execute a workflow."""
     try:
-        result = await workflow_engine.execute_workflow(
+        result = await app.state.workflow_engine.execute_workflow(
             workflow_id=request.workflow_id,
             input_data=request.input_data,
             execution_id=request.execution_id
         )
         
-        return ExecutionResponse(
-            execution_id=result.execution_id,
-            status=result.status.value,
-            output=result.output,
-            error=result.error,
-            execution_time_ms=result.execution_time_ms,
-            token_usage=result.token_usage
-        )
+        return _execution_response(result)
     
     except Exception as e:
-        logger.error(f"Workflow execution failed: {e}")
+        logger.error("Workflow execution failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/workflows")
-async def list_workflows():
+def list_workflows():
     """List all available workflows."""
     try:
-        workflows = config_loader.list_workflows()
-        return {"workflows": workflows}
+        return _cached_json_response(
+            ("workflows", ""),
+            config_loader.workflows_dir,
+            lambda: {"workflows": config_loader.list_workflows()}
+        )
     
     except Exception as e:
-        logger.error(f"Failed to list workflows: {e}")
+        logger.error("Failed to list workflows", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/workflows/{workflow_id}")
-async def get_workflow(workflow_id: str):
+def get_workflow(workflow_id: str):
     """Get workflow configuration."""
     try:
-        workflow_config = config_loader.load_workflow(workflow_id)
-        return {
-            "name": workflow_config.name,
-            "description": workflow_config.description,
-            "version": workflow_config.version,
-            "workflow_type": workflow_config.workflow_type.value,
-            "steps": [step.dict() for step in workflow_config.steps]
-        }
+        def build():
+            workflow_config = config_loader.load_workflow(workflow_id)
+            return {
+                "name": workflow_config.name,
+                "description": workflow_config.description,
+                "version": workflow_config.version,
+                "workflow_type": workflow_config.workflow_type.value,
+                "steps": [step.dict() for step in workflow_config.steps]
+            }
+        
+        return _cached_json_response(
+            ("workflow", workflow_id),
+            config_loader.workflows_dir / f"{workflow_id}.yaml",
+            build
+        )
     
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Workflow not found")
     except Exception as e:
-        logger.error(f"Failed to get workflow: {e}")
+        logger.error("Failed to get workflow", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -163,56 +227,59 @@ async def get_workflow(workflow_id: str):
 async def execute_agent(request: AgentExecutionRequest):
     """Execute an agent."""
     try:
-        result = await workflow_engine.execute_agent(
+        result = await app.state.workflow_engine.execute_agent(
             agent_id=request.agent_id,
             input_data=request.input_data,
             execution_id=request.execution_id
         )
         
-        return ExecutionResponse(
-            execution_id=result.execution_id,
-            status=result.status.value,
-            output=result.output,
-            error=result.error,
-            execution_time_ms=result.execution_time_ms,
-            token_usage=result.token_usage
-        )
+        return _execution_response(result)
     
     except Exception as e:
-        logger.error(f"Agent execution failed: {e}")
+        logger.error("Agent execution failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/agents")
-async def list_agents():
+def list_agents():
     """List all available agents."""
     try:
-        agents = config_loader.list_agents()
-        return {"agents": agents}
+        return _cached_json_response(
+            ("agents", ""),
+            config_loader.agents_dir,
+            lambda: {"agents": config_loader.list_agents()}
+        )
     
     except Exception as e:
-        logger.error(f"Failed to list agents: {e}")
+        logger.error("Failed to list agents", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/agents/{agent_id}")
-async def get_agent(agent_id: str):
+def get_agent(agent_id: str):
     """Get agent configuration."""
     try:
-        agent_config = config_loader.load_agent(agent_id)
-        return {
-            "name": agent_config.name,
-            "description": agent_config.description,
-            "version": agent_config.version,
-            "agent_type": agent_config.agent_type.value,
-            "model": agent_config.model,
-            "tools": agent_config.tools
-        }
+        def build():
+            agent_config = config_loader.load_agent(agent_id)
+            return {
+                "name": agent_config.name,
+                "description": agent_config.description,
+                "version": agent_config.version,
+                "agent_type": agent_config.agent_type.value,
+                "model": agent_config.model,
+                "tools": agent_config.tools
+            }
+        
+        return _cached_json_response(
+            ("agent", agent_id),
+            config_loader.agents_dir / f"{agent_id}.yaml",
+            build
+        )
     
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Agent not found")
     except Exception as e:
-        logger.error(f"Failed to get agent: {e}")
+        logger.error("Failed to get agent", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -221,46 +288,41 @@ async def get_agent(agent_id: str):
 async def get_execution(execution_id: str):
     """Get execution result by ID."""
     try:
-        result = workflow_engine.get_execution(execution_id)
+        result = app.state.workflow_engine.get_execution(execution_id)
         if not result:
             raise HTTPException(status_code=404, detail="Execution not found")
         
-        return ExecutionResponse(
-            execution_id=result.execution_id,
-            status=result.status.value,
-            output=result.output,
-            error=result.error,
-            execution_time_ms=result.execution_time_ms,
-            token_usage=result.token_usage
-        )
+        return _execution_response(result)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get execution: {e}")
+        logger.error("Failed to get execution", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/executions")
 async def list_executions():
-    """List all executions."""
+    """List all executions as newline-delimited JSON."""
+    async def generate():
+        for i, exec in enumerate(app.state.workflow_engine.iter_executions(), 1):
+            yield orjson.dumps({
+                "execution_id": exec.execution_id,
+                "workflow_id": getattr(exec, 'workflow_id', None),
+                "agent_id": getattr(exec, 'agent_id', None),
+                "status": exec.status.value,
+                "execution_time_ms": exec.execution_time_ms
+            }) + b"\n"
+            
+            # Periodically yield to the event loop on large listings
+            if i % 256 == 0:
+                await asyncio.sleep(0)
+    
     try:
-        executions = workflow_engine.list_executions()
-        return {
-            "executions": [
-                {
-                    "execution_id": exec.execution_id,
-                    "workflow_id": getattr(exec, 'workflow_id', None),
-                    "agent_id": getattr(exec, 'agent_id', None),
-                    "status": exec.status.value,
-                    "execution_time_ms": exec.execution_time_ms
-                }
-                for exec in executions
-            ]
-        }
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
     
     except Exception as e:
-        logger.error(f"Failed to list executions: {e}")
+        logger.error("Failed to list executions", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -268,7 +330,7 @@ async def list_executions():
 async def cancel_execution(execution_id: str):
     """Cancel a running execution."""
     try:
-        success = workflow_engine.cancel_execution(execution_id)
+        success = app.state.workflow_engine.cancel_execution(execution_id)
         if not success:
             raise HTTPException(status_code=404, detail="Execution not found or not cancellable")
         
@@ -277,46 +339,54 @@ async def cancel_execution(execution_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to cancel execution: {e}")
+        logger.error("Failed to cancel execution", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Prompt template endpoints
 @app.get("/api/v1/prompts")
-async def list_prompt_templates():
+def list_prompt_templates():
     """List all prompt templates."""
     try:
         templates = prompt_manager.list_templates()
         return {"templates": templates}
     
     except Exception as e:
-        logger.error(f"Failed to list prompt templates: {e}")
+        logger.error("Failed to list prompt templates", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/prompts/{category}/{template_name}")
-async def get_prompt_template(category: str, template_name: str):
+def get_prompt_template(category: str, template_name: str):
     """Get a prompt template."""
     try:
-        content = prompt_manager.get_template_content(category, template_name)
-        if not content:
-            raise HTTPException(status_code=404, detail="Template not found")
+        def build():
+            content = prompt_manager.get_template_content(category, template_name)
+            if not content:
+                raise HTTPException(status_code=404, detail="Template not found")
+            return {"content": content, "category": category, "template_name": template_name}
         
-        return {"content": content, "category": category, "template_name": template_name}
+        return _cached_json_response(
+            ("prompt", f"{category}/{template_name}"),
+            prompt_manager.get_template_path(category, template_name),
+            build
+        )
     
     except HTTPException:
         raise
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Template not found")
     except Exception as e:
-        logger.error(f"Failed to get prompt template: {e}")
+        logger.error("Failed to get prompt template", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Statistics endpoint
 @app.get("/api/v1/stats")
-async def get_statistics():
+def get_statistics():
     """Get platform statistics."""
     try:
-        execution_stats = workflow_engine.get_execution_stats()
+        execution_stats = app.state.workflow_engine.get_execution_stats()
         return {
             "executions": execution_stats,
             "workflows": len(config_loader.list_workflows()),
@@ -324,7 +394,7 @@ async def get_statistics():
         }
     
     except Exception as e:
-        logger.error(f"Failed to get statistics: {e}")
+        logger.error("Failed to get statistics", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -332,18 +402,37 @@ async def get_statistics():
 @app.get("/api/v1/executions/{execution_id}/stream")
 async def stream_execution(execution_id: str):
     """Stream execution updates."""
+    engine = app.state.workflow_engine
+    if not engine.get_execution(execution_id):
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
     async def generate():
         while True:
-            result = workflow_engine.get_execution(execution_id)
-            if result:
-                yield f"data: {json.dumps(result.__dict__)}\n\n"
+            # Subscribe before reading so no update between the two is missed
+            update = engine.watch_execution(execution_id)
+            try:
+                result = engine.get_execution(execution_id)
+                if not result:
+                    # Expired from the execution store
+                    break
+                yield f"data: {orjson.dumps(result.to_dict(), default=str).decode()}\n\n"
                 if result.status.value in ["completed", "failed", "cancelled"]:
                     break
-            await asyncio.sleep(1)
+                await update.wait()
+            finally:
+                # Runs on client disconnect too, so abandoned watchers don't accumulate
+                engine.unwatch_execution(execution_id, update)
     
-    return StreamingResponse(generate(), media_type="text/plain")
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "src.api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        loop="uvloop",
+        http="httptools"
+    )
@@ -2,6 +2,8 @@
 Memory management chain for conversation history and context.
 """
 
+import asyncio
+import orjson
 from typing import List, Dict, Any, Optional, Union
 from langchain.memory import (
     ConversationBufferMemory,
@@ -9,12 +11,29 @@ from langchain.memory import (
     ConversationEntityMemory,
     CombinedMemory
 )
-from langchain.schema import BaseLanguageModel
+from langchain.chains import LLMChain
+from langchain.schema import (
+    AIMessage,
+    BaseLanguageModel,
+    HumanMessage,
+    SystemMessage,
+    get_buffer_string,
+    messages_from_dict,
+    messages_to_dict
+)
 from langchain.prompts import PromptTemplate
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+_ROLE_TO_CLS = {
+    "user": HumanMessage,
+    "human": HumanMessage,
+    "assistant": AIMessage,
+    "ai": AIMessage,
+    "system": SystemMessage
+}
+
 
 class MemoryChain:
     """Chain for managing conversation memory and context."""
@@ -33,6 +52,9 @@ class MemoryChain:
         
         # Create memory based on type
         self.memory = self._create_memory()
+        self._index_memories()
+        # Messages already folded into the summary/entity memories; the rest are folded on read
+        self._folded = 0
     
     def _create_memory(self):
         """Create memory instance based on type."""
@@ -76,58 +98,55 @@ class MemoryChain:
         else:
             raise ValueError(f"Unsupported memory type: {self.memory_type}")
     
+    def _index_memories(self):
+        """Precompute which (sub-)memories support each operation, once per memory instance."""
+        memories = getattr(self.memory, 'memories', [self.memory])
+        self._chat_memories = [m for m in memories if hasattr(m, 'chat_memory')]
+        self._var_memories = [m for m in memories if hasattr(m, 'load_memory_variables')]
+        self._clear_memories = [m for m in memories if hasattr(m, 'clear')]
+        self._derived_memories = [
+            m for m in memories
+            if isinstance(m, (ConversationSummaryMemory, ConversationEntityMemory))
+        ]
+    
     def add_message(self, role: str, content: str, **kwargs):
         """Add a message to memory."""
         try:
-            if hasattr(self.memory, 'chat_memory'):
-                self.memory.chat_memory.add_message(
-                    {"role": role, "content": content}
-                )
-            else:
-                # For combined memory, add to all sub-memories
-                for memory in self.memory.memories:
-                    if hasattr(memory, 'chat_memory'):
-                        memory.chat_memory.add_message(
-                            {"role": role, "content": content}
-                        )
+            # Build the message once and share it across sub-memories
+            message = _ROLE_TO_CLS[role](content=content)
             
-            logger.info(f"Added {role} message to memory")
+            for memory in self._chat_memories:
+                memory.chat_memory.add_message(message)
+            
+            logger.info("Added message to memory", role=role)
         
         except Exception as e:
-            logger.error(f"Failed to add message to memory: {e}")
+            logger.error("Failed to add message to memory", error=str(e))
     
     def get_memory_variables(self) -> Dict[str, Any]:
         """Get memory variables for use in prompts."""
         try:
-            if hasattr(self.memory, 'load_memory_variables'):
-                return self.memory.load_memory_variables({})
-            else:
-                # For combined memory, get variables from all sub-memories
-                variables = {}
-                for memory in self.memory.memories:
-                    if hasattr(memory, 'load_memory_variables'):
-                        variables.update(memory.load_memory_variables({}))
-                return variables
+            self.refresh_derived_memories()
+            variables = {}
+            for memory in self._var_memories:
+                variables.update(memory.load_memory_variables({}))
+            return variables
         
         except Exception as e:
-            logger.error(f"Failed to get memory variables: {e}")
+            logger.error("Failed to get memory variables", error=str(e))
             return {}
     
     def clear_memory(self):
         """Clear all memory."""
         try:
-            if hasattr(self.memory, 'clear'):
-                self.memory.clear()
-            else:
-                # For combined memory, clear all sub-memories
-                for memory in self.memory.memories:
-                    if hasattr(memory, 'clear'):
-                        memory.clear()
+            for memory in self._clear_memories:
+                memory.clear()
+            self._folded = 0
             
             logger.info("Cleared memory")
         
         except Exception as e:
-            logger.error(f"Failed to clear memory: {e}")
+            logger.error("Failed to clear memory", error=str(e))
     
     def get_conversation_summary(self) -> str:
         """Get a summary of the conversation."""
@@ -141,7 +160,7 @@ class MemoryChain:
                 return variables.get("chat_history", "")
         
         except Exception as e:
-            logger.error(f"Failed to get conversation summary: {e}")
+            logger.error("Failed to get conversation summary", error=str(e))
             return ""
     
     def get_entities(self) -> Dict[str, str]:
@@ -154,9 +173,66 @@ class MemoryChain:
                 return {}
         
         except Exception as e:
-            logger.error(f"Failed to get entities: {e}")
+            logger.error("Failed to get entities", error=str(e))
             return {}
     
+    async def aget_conversation_summary(self) -> str:
+        """Get a summary of the conversation without blocking the event loop."""
+        return await asyncio.to_thread(self.get_conversation_summary)
+    
+    async def aget_entities(self) -> Dict[str, str]:
+        """Get entities from conversation without blocking the event loop."""
+        return await asyncio.to_thread(self.get_entities)
+    
+    def refresh_derived_memories(self):
+        """Fold messages added since the last refresh into the summary/entity memories.
+        
+        Called on read, so a turn costs no LLM calls until the summary or entities are needed,
+        and any number of new messages are folded in one pass.
+        """
+        if not self._derived_memories:
+            return
+        
+        try:
+            for memory in self._derived_memories:
+                new_lines = memory.chat_memory.messages[self._folded:]
+                if not new_lines:
+                    continue
+                if isinstance(memory, ConversationSummaryMemory):
+                    memory.buffer = memory.predict_new_summary(new_lines, memory.buffer)
+                else:
+                    self._update_entities(memory, new_lines)
+            
+            self._folded = len(self._derived_memories[0].chat_memory.messages)
+        
+        except Exception as e:
+            logger.error("Failed to update derived memory", error=str(e))
+    
+    @staticmethod
+    def _update_entities(memory: ConversationEntityMemory, new_lines: list):
+        """Extract entities from the new lines and store an updated summary for each."""
+        human_lines = [m.content for m in new_lines if isinstance(m, HumanMessage)]
+        input_text = human_lines[-1] if human_lines else new_lines[-1].content
+        
+        # Populates memory.entity_cache with the entities mentioned around input_text
+        memory.load_memory_variables({"input": input_text})
+        
+        # Same summarization ConversationEntityMemory.save_context runs, which add_message bypasses
+        history = get_buffer_string(
+            memory.buffer[-memory.k * 2:],
+            human_prefix=memory.human_prefix,
+            ai_prefix=memory.ai_prefix
+        )
+        chain = LLMChain(llm=memory.llm, prompt=memory.entity_summarization_prompt)
+        for entity in memory.entity_cache:
+            summary = chain.predict(
+                summary=memory.entity_store.get(entity, ""),
+                entity=entity,
+                history=history,
+                input=input_text
+            )
+            memory.entity_store.set(entity, summary.strip())
+    
     def get_memory_stats(self) -> Dict[str, Any]:
         """Get statistics about memory usage."""
         try:
@@ -169,47 +245,71 @@ class MemoryChain:
             }
             
             # Get message count for buffer memory
-            if hasattr(self.memory, 'chat_memory'):
-                stats["message_count"] = len(self.memory.chat_memory.messages)
-            elif hasattr(self.memory, 'memories'):
-                # For combined memory
-                total_messages = 0
-                for memory in self.memory.memories:
-                    if hasattr(memory, 'chat_memory'):
-                        total_messages += len(memory.chat_memory.messages)
-                stats["message_count"] = total_messages
+            stats["message_count"] = sum(
+                len(memory.chat_memory.messages) for memory in self._chat_memories
+            )
             
             return stats
         
         except Exception as e:
-            logger.error(f"Failed to get memory stats: {e}")
+            logger.error("Failed to get memory stats", error=str(e))
             return {"error": str(e)}
     
     def save_memory(self, file_path: str):
         """Save memory to file."""
         try:
-            import pickle
+            messages = self._chat_memories[0].chat_memory.messages if self._chat_memories else []
+            
+            payload = {
+                "memory_type": self.memory_type,
+                "messages": messages_to_dict(messages),
+                # Folded summary/entity state, so loading doesn't re-summarize the history
+                "folded": self._folded,
+                "summary": None,
+                "entities": None
+            }
+            for memory in self._derived_memories:
+                if isinstance(memory, ConversationSummaryMemory):
+                    payload["summary"] = memory.buffer
+                elif hasattr(memory.entity_store, "store"):
+                    payload["entities"] = dict(memory.entity_store.store)
             
             with open(file_path, 'wb') as f:
-                pickle.dump(self.memory, f)
+                f.write(orjson.dumps(payload))
             
-            logger.info(f"Saved memory to {file_path}")
+            logger.info("Saved memory", file_path=file_path)
         
         except Exception as e:
-            logger.error(f"Failed to save memory: {e}")
+            logger.error("Failed to save memory", error=str(e))
     
     def load_memory(self, file_path: str):
         """Load memory from file."""
         try:
-            import pickle
-            
             with open(file_path, 'rb') as f:
-                self.memory = pickle.load(f)
+                payload = orjson.loads(f.read())
+            
+            # Rebuild a fresh memory and replay the saved history into it
+            self.memory = self._create_memory()
+            self._index_memories()
+            messages = messages_from_dict(payload.get("messages", []))
+            for memory in self._chat_memories:
+                for message in messages:
+                    memory.chat_memory.add_message(message)
+            
+            self._folded = 0
+            if "folded" in payload:
+                for memory in self._derived_memories:
+                    if isinstance(memory, ConversationSummaryMemory):
+                        memory.buffer = payload.get("summary") or ""
+                    elif payload.get("entities"):
+                        for entity, summary in payload["entities"].items():
+                            memory.entity_store.set(entity, summary)
+                self._folded = payload["folded"]
             
-            logger.info(f"Loaded memory from {file_path}")
+            logger.info("Loaded memory", file_path=file_path)
         
         except Exception as e:
-            logger.error(f"Failed to load memory: {e}")
+            logger.error("Failed to load memory", error=str(e))
     
     def get_memory(self):
         """Get the memory instance."""
@@ -2,6 +2,8 @@
 RAG (Retrieval-Augmented Generation) chain implementation.
 """
 
+import asyncio
+import os
 from typing import List, Dict, Any, Optional, Union
 from langchain.chains import RetrievalQA
 from langchain.chains.base import Chain
@@ -16,6 +18,9 @@ logger = structlog.get_logger(__name__)
 class RAGChain:
     """RAG chain for document Q&A with retrieval and generation."""
     
+    # Caps in-flight chain runs across all instances to stay within the LLM rate limit
+    _llm_sema = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+    
     def __init__(
         self,
         retriever: BaseRetriever,
@@ -39,7 +44,8 @@ class RAGChain:
     async def arun(self, query: str, **kwargs) -> Dict[str, Any]:
         """Run the RAG chain asynchronously."""
         try:
-            result = await self.chain.ainvoke({"query": query})
+            async with self._llm_sema:
+                result = await self.chain.ainvoke({"query": query})
             
             return {
                 "answer": result.get("result", ""),
@@ -49,7 +55,7 @@ class RAGChain:
             }
         
         except Exception as e:
-            logger.error(f"RAG chain execution failed: {e}")
+            logger.error("RAG chain execution failed", error=str(e))
             return {
                 "answer": "",
                 "source_documents": [],
@@ -71,7 +77,7 @@ class RAGChain:
             }
         
         except Exception as e:
-            logger.error(f"RAG chain execution failed: {e}")
+            logger.error("RAG chain execution failed", error=str(e))
             return {
                 "answer": "",
                 "source_documents": [],
@@ -2,9 +2,17 @@
 Tool calling chain for SQL and API interactions.
 """
 
+import asyncio
+import os
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Union
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain.tools import BaseTool
+from langchain.tools.render import format_tool_to_openai_tool
+from langchain_core.runnables import RunnablePassthrough
 from langchain.schema import BaseLanguageModel
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.memory import ConversationBufferMemory
@@ -13,17 +21,34 @@ import structlog
 logger = structlog.get_logger(__name__)
 
 
+@lru_cache(maxsize=32)
+def _build_prompt(system_prompt: str) -> ChatPromptTemplate:
+    """Build the agent prompt; it depends only on the system prompt, not the tools."""
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+
+
 class ToolCallingChain:
     """Chain for tool calling with SQL and API tools."""
     
+    # Caps in-flight agent runs across all instances to stay within the LLM rate limit
+    _llm_sema = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+    
     def __init__(
         self,
         llm: BaseLanguageModel,
         tools: List[BaseTool],
         system_prompt: Optional[str] = None,
-        memory: Optional[ConversationBufferMemory] = None
+        memory: Optional[ConversationBufferMemory] = None,
+        verbose: Optional[bool] = None
     ):
         self.llm = llm
+        # Verbose output is synchronous console I/O on every agent step; opt in only
+        self.verbose = verbose if verbose is not None else os.getenv("LANGCHAIN_VERBOSE") == "1"
         self.tools = tools
         self.system_prompt = system_prompt or self._get_default_system_prompt()
         self.memory = memory or ConversationBufferMemory(
@@ -31,15 +56,14 @@ class ToolCallingChain:
             return_messages=True
         )
         
+        # Prompt and per-tool OpenAI schemas are built once and reused across rebuilds
+        self._prompt = _build_prompt(self.system_prompt)
+        self._tool_schemas: Dict[int, Dict[str, Any]] = {}
+        
         # Create the agent
-        self.agent = self._create_agent()
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            handle_parsing_errors=True
-        )
+        self._defer_rebuild = False
+        self._rebuild_pending = False
+        self._rebuild_agent()
     
     def _get_default_system_prompt(self) -> str:
         """Get the default system prompt for tool calling."""
@@ -60,26 +84,62 @@ Always be helpful and accurate in your responses."""
     
     def _create_agent(self):
         """Create the OpenAI tools agent."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", self.system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
+        # Same pipeline as create_openai_tools_agent, but only new tools get a schema built
+        self._tool_schemas = {
+            id(tool): self._tool_schemas.get(id(tool)) or format_tool_to_openai_tool(tool)
+            for tool in self.tools
+        }
+        llm_with_tools = self.llm.bind(tools=list(self._tool_schemas.values()))
         
-        return create_openai_tools_agent(
-            llm=self.llm,
+        return (
+            RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_to_openai_tool_messages(x["intermediate_steps"])
+            )
+            | self._prompt
+            | llm_with_tools
+            | OpenAIToolsAgentOutputParser()
+        )
+    
+    def _rebuild_agent(self):
+        """Recreate the agent and executor, or defer it inside batch_mutate()."""
+        if self._defer_rebuild:
+            self._rebuild_pending = True
+            return
+        
+        self.agent = self._create_agent()
+        self.agent_executor = AgentExecutor(
+            agent=self.agent,
             tools=self.tools,
-            prompt=prompt
+            memory=self.memory,
+            verbose=self.verbose,
+            handle_parsing_errors=True
         )
+        self._rebuild_pending = False
+    
+    @contextmanager
+    def batch_mutate(self):
+        """Defer agent rebuilds from add_tool/remove_tool until the block exits."""
+        if self._defer_rebuild:
+            # Nested block; the outermost one rebuilds
+            yield self
+            return
+        
+        self._defer_rebuild = True
+        try:
+            yield self
+        finally:
+            self._defer_rebuild = False
+            if self._rebuild_pending:
+                self._rebuild_agent()
     
     async def arun(self, input_text: str, **kwargs) -> Dict[str, Any]:
         """Run the tool calling chain asynchronously."""
         try:
-            result = await self.agent_executor.ainvoke({
-                "input": input_text,
-                **kwargs
-            })
+            async with self._llm_sema:
+                result = await self.agent_executor.ainvoke({
+                    "input": input_text,
+                    **kwargs
+                })
             
             return {
                 "output": result.get("output", ""),
@@ -89,7 +149,7 @@ Always be helpful and accurate in your responses."""
             }
         
         except Exception as e:
-            logger.error(f"Tool calling chain execution failed: {e}")
+            logger.error("Tool calling chain execution failed", error=str(e))
             return {
                 "output": "",
                 "intermediate_steps": [],
@@ -114,7 +174,7 @@ Always be helpful and accurate in your responses."""
             }
         
         except Exception as e:
-            logger.error(f"Tool calling chain execution failed: {e}")
+            logger.error("Tool calling chain execution failed", error=str(e))
             return {
                 "output": "",
                 "intermediate_steps": [],
@@ -131,29 +191,21 @@ Always be helpful and accurate in your responses."""
         """Add a tool to the chain."""
         self.tools.append(tool)
         # Recreate agent with new tools
-        self.agent = self._create_agent()
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            handle_parsing_errors=True
-        )
-        logger.info(f"Added tool: {tool.name}")
+        self._rebuild_agent()
+        logger.info("Added tool", tool_name=tool.name)
+    
+    def set_tools(self, tools: List[BaseTool]):
+        """Replace all tools, rebuilding the agent once."""
+        self.tools = list(tools)
+        self._rebuild_agent()
+        logger.info("Set tools", tool_count=len(self.tools))
     
     def remove_tool(self, tool_name: str):
         """Remove a tool from the chain."""
         self.tools = [tool for tool in self.tools if tool.name != tool_name]
         # Recreate agent with updated tools
-        self.agent = self._create_agent()
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            handle_parsing_errors=True
-        )
-        logger.info(f"Removed tool: {tool_name}")
+        self._rebuild_agent()
+        logger.info("Removed tool", tool_name=tool_name)
     
     def get_memory(self) -> ConversationBufferMemory:
         """Get the memory used by this chain."""
@@ -3,12 +3,69 @@ Configuration loader for workflows and agents.
 Supports YAML-based configuration with validation and environment overrides.
 """
 
+import hashlib
 import os
+import re
+import threading
+import orjson
+import structlog
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field, validator
+from typing import Dict, Any, Optional, List, Tuple
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from enum import Enum
+from ..utils.fs import ensure_dir
+
+logger = structlog.get_logger(__name__)
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# ${VAR} references in string values, whole-string or embedded in other text (e.g.
+# "postgres://${DB_HOST}/app"); unset variables are left as-is and mapping keys are never substituted
+_ENV_RE = re.compile(r"\$\{([^}]+)\}")
+
+
+def _env_replacement(match: "re.Match") -> str:
+    """Resolve one ${VAR} match from the environment."""
+    return os.environ.get(match.group(1), match.group(0))
+
+
+class _EnvVarLoader(_YamlLoader):
+    """YAML loader that substitutes ${VAR} references while constructing string values."""
+    
+    def construct_mapping(self, node: yaml.MappingNode, deep: bool = False) -> Dict[Any, Any]:
+        """Construct a mapping whose string keys are kept verbatim; only values are substituted."""
+        self.flatten_mapping(node)
+        mapping = {}
+        for key_node, value_node in node.value:
+            if key_node.tag == "tag:yaml.org,2002:str":
+                key = self.construct_scalar(key_node)
+            else:
+                key = self.construct_object(key_node, deep=deep)
+            try:
+                hash(key)
+            except TypeError as e:
+                raise yaml.constructor.ConstructorError(
+                    "while constructing a mapping", node.start_mark,
+                    f"found unhashable key ({e})", key_node.start_mark
+                ) from None
+            mapping[key] = self.construct_object(value_node, deep=deep)
+        return mapping
+
+
+def _construct_env_str(loader: _EnvVarLoader, node: yaml.ScalarNode) -> str:
+    """Construct a string scalar (plain or quoted) with env vars substituted."""
+    value = loader.construct_scalar(node)
+    if "${" in value:
+        return _ENV_RE.sub(_env_replacement, value)
+    return value
+
+
+_EnvVarLoader.add_constructor("tag:yaml.org,2002:str", _construct_env_str)
 
 
 class WorkflowType(str, Enum):
@@ -37,6 +94,7 @@ class StepConfig(BaseModel):
     condition: Optional[str] = None
     retry_count: int = 3
     timeout_seconds: int = 30
+    depends_on: List[str] = Field(default_factory=list)
 
 
 class WorkflowConfig(BaseModel):
@@ -52,7 +110,8 @@ class WorkflowConfig(BaseModel):
     max_retries: int = 3
     timeout_seconds: int = 300
 
-    @validator('steps')
+    @field_validator('steps')
+    @classmethod
     def validate_steps(cls, v):
         if not v:
             raise ValueError("Workflow must have at least one step")
@@ -73,6 +132,11 @@ class AgentConfig(BaseModel):
     token_budget: Optional[int] = None
 
 
+# Validators built once at import and reused for every load
+_WF_ADAPTER = TypeAdapter(WorkflowConfig)
+_AGENT_ADAPTER = TypeAdapter(AgentConfig)
+
+
 class ConfigLoader:
     """Loads and validates workflow and agent configurations from YAML files."""
     
@@ -82,72 +146,179 @@ class ConfigLoader:
         self.agents_dir = self.config_dir / "agents"
         
         # Ensure directories exist
-        self.workflows_dir.mkdir(parents=True, exist_ok=True)
-        self.agents_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.workflows_dir)
+        ensure_dir(self.agents_dir)
+        
+        # Parsed configs keyed by ID, valid while the file's mtime is unchanged
+        self._wf_cache: Dict[str, Tuple[int, WorkflowConfig]] = {}
+        self._agent_cache: Dict[str, Tuple[int, AgentConfig]] = {}
+        self._cache_lock = threading.Lock()
+        
+        # validate_config results keyed by a digest of the canonical config, FIFO-evicted
+        self._validate_cache: Dict[bytes, bool] = {}
+        self._validate_cache_max = 1024
     
     def load_workflow(self, workflow_id: str) -> WorkflowConfig:
         """Load a workflow configuration from YAML file."""
         workflow_file = self.workflows_dir / f"{workflow_id}.yaml"
         
-        if not workflow_file.exists():
-            raise FileNotFoundError(f"Workflow config not found: {workflow_file}")
+        try:
+            mtime = workflow_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Workflow config not found: {workflow_file}") from None
         
-        with open(workflow_file, 'r') as f:
-            config_data = yaml.safe_load(f)
+        cached = self._wf_cache.get(workflow_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
         
-        # Apply environment variable substitution
-        config_data = self._substitute_env_vars(config_data)
+        with open(workflow_file, 'r') as f:
+            # Environment variables are substituted during parsing
+            config_data = yaml.load(f, Loader=_EnvVarLoader)
         
-        return WorkflowConfig(**config_data)
+        config = _WF_ADAPTER.validate_python(config_data)
+        with self._cache_lock:
+            self._wf_cache[workflow_id] = (mtime, config)
+        return config
     
     def load_agent(self, agent_id: str) -> AgentConfig:
         """Load an agent configuration from YAML file."""
         agent_file = self.agents_dir / f"{agent_id}.yaml"
         
-        if not agent_file.exists():
-            raise FileNotFoundError(f"Agent config not found: {agent_file}")
+        try:
+            mtime = agent_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Agent config not found: {agent_file}") from None
+        
+        cached = self._agent_cache.get(agent_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
         
         with open(agent_file, 'r') as f:
-            config_data = yaml.safe_load(f)
+            # Environment variables are substituted during parsing
+            config_data = yaml.load(f, Loader=_EnvVarLoader)
+        
+        config = _AGENT_ADAPTER.validate_python(config_data)
+        with self._cache_lock:
+            self._agent_cache[agent_id] = (mtime, config)
+        return config
+    
+    def peek_workflow(self, workflow_id: str) -> Optional[WorkflowConfig]:
+        """Get a cached workflow config if it is still current, without reading the file."""
+        return self._peek(self._wf_cache, self.workflows_dir / f"{workflow_id}.yaml", workflow_id)
+    
+    def peek_agent(self, agent_id: str) -> Optional[AgentConfig]:
+        """Get a cached agent config if it is still current, without reading the file."""
+        return self._peek(self._agent_cache, self.agents_dir / f"{agent_id}.yaml", agent_id)
+    
+    @staticmethod
+    def _peek(cache: Dict[str, Tuple[int, Any]], config_file: Path, config_id: str) -> Optional[Any]:
+        """Return a cache entry whose mtime still matches the file, else None."""
+        cached = cache.get(config_id)
+        if cached is None:
+            return None
+        try:
+            mtime = config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        return cached[1] if cached[0] == mtime else None
+    
+    def invalidate(self, workflow_id: Optional[str] = None, agent_id: Optional[str] = None):
+        """Drop cached configs; with no arguments, clear everything."""
+        with self._cache_lock:
+            if workflow_id is None and agent_id is None:
+                self._wf_cache.clear()
+                self._agent_cache.clear()
+                return
+            if workflow_id is not None:
+                self._wf_cache.pop(workflow_id, None)
+            if agent_id is not None:
+                self._agent_cache.pop(agent_id, None)
+    
+    def preload_all(self) -> Dict[str, str]:
+        """Parse every workflow and agent config concurrently to warm the cache.
+        
+        Returns load errors keyed by file name; one bad config doesn't stop the rest.
+        """
+        jobs = [
+            (self.load_workflow, workflow_id, f"workflows/{workflow_id}.yaml")
+            for workflow_id in self.list_workflows()
+        ]
+        jobs += [
+            (self.load_agent, agent_id, f"agents/{agent_id}.yaml")
+            for agent_id in self.list_agents()
+        ]
+        errors: Dict[str, str] = {}
+        
+        def load(job):
+            loader, config_id, file_name = job
+            try:
+                loader(config_id)
+            except Exception as e:
+                errors[file_name] = str(e)
         
-        # Apply environment variable substitution
-        config_data = self._substitute_env_vars(config_data)
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            list(executor.map(load, jobs))
         
-        return AgentConfig(**config_data)
+        for file_name, error in errors.items():
+            logger.error("Failed to preload config", file_name=file_name, error=error)
+        
+        return errors
     
     def list_workflows(self) -> List[str]:
         """List all available workflow IDs."""
-        return [f.stem for f in self.workflows_dir.glob("*.yaml")]
+        return self._list_yaml_ids(self.workflows_dir)
     
     def list_agents(self) -> List[str]:
         """List all available agent IDs."""
-        return [f.stem for f in self.agents_dir.glob("*.yaml")]
+        return self._list_yaml_ids(self.agents_dir)
     
-    def _substitute_env_vars(self, data: Any) -> Any:
-        """Recursively substitute environment variables in configuration data."""
-        if isinstance(data, dict):
-            return {k: self._substitute_env_vars(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._substitute_env_vars(item) for item in data]
-        elif isinstance(data, str) and data.startswith("${") and data.endswith("}"):
-            env_var = data[2:-1]
-            return os.getenv(env_var, data)
-        else:
-            return data
+    @staticmethod
+    def _list_yaml_ids(directory: Path) -> List[str]:
+        """List the stems of the .yaml files in a directory."""
+        with os.scandir(directory) as entries:
+            return [
+                e.name[:-5] for e in entries
+                if e.name.endswith(".yaml") and e.is_file()
+            ]
     
     def validate_config(self, config: Dict[str, Any], config_type: str) -> bool:
         """Validate configuration data against schema."""
+        try:
+            canonical = orjson.dumps(
+                config,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+                default=str
+            )
+            key = hashlib.blake2b(
+                config_type.encode() + b"\0" + canonical, digest_size=16
+            ).digest()
+        except TypeError:
+            key = None
+        
+        if key is not None:
+            cached = self._validate_cache.get(key)
+            if cached is not None:
+                return cached
+        
         try:
             if config_type == "workflow":
-                WorkflowConfig(**config)
+                _WF_ADAPTER.validate_python(config)
             elif config_type == "agent":
-                AgentConfig(**config)
+                _AGENT_ADAPTER.validate_python(config)
             else:
                 raise ValueError(f"Unknown config type: {config_type}")
-            return True
+            valid = True
         except Exception as e:
-            print(f"Configuration validation failed: {e}")
-            return False
+            logger.error("Configuration validation failed", config_type=config_type, error=str(e))
+            valid = False
+        
+        if key is not None:
+            with self._cache_lock:
+                if len(self._validate_cache) >= self._validate_cache_max:
+                    self._validate_cache.pop(next(iter(self._validate_cache)))
+                self._validate_cache[key] = valid
+        
+        return valid
 
 
 # Global config loader instance
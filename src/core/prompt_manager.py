@@ -4,13 +4,19 @@ Supports Jinja2 templating with variable interpolation and template inheritance.
 """
 
 import os
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from jinja2 import Environment, FileSystemLoader, Template, TemplateNotFound
+from typing import Dict, Any, Optional, List, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, TemplateNotFound
 import structlog
+from ..utils.fs import ensure_dir
 
 logger = structlog.get_logger(__name__)
 
+# Context value types whose renders are safe to memoize; tuples are left out since their
+# items would need the same type-aware keying
+_CACHEABLE_TYPES = (str, int, float, bool, type(None))
+
 
 class PromptManager:
     """Manages prompt templates with Jinja2 templating support."""
@@ -20,17 +26,44 @@ class PromptManager:
         self.system_dir = self.prompts_dir / "system"
         self.user_dir = self.prompts_dir / "user"
         self.critique_dir = self.prompts_dir / "critique"
+        self._dirs = {
+            "system": self.system_dir,
+            "user": self.user_dir,
+            "critique": self.critique_dir
+        }
         
         # Ensure directories exist
-        for dir_path in [self.system_dir, self.user_dir, self.critique_dir]:
-            dir_path.mkdir(parents=True, exist_ok=True)
+        for dir_path in self._dirs.values():
+            ensure_dir(dir_path)
         
-        # Initialize Jinja2 environment
+        # Compiled template bytecode persists across restarts; Jinja keys it by source checksum.
+        # Bytecode is unmarshalled as code, so the directory must be private: Jinja's default
+        # per-user directory is created 0700 and ownership-checked
+        bytecode_dir = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+        if bytecode_dir:
+            Path(bytecode_dir).mkdir(mode=0o700, parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(directory=bytecode_dir)
+        else:
+            bytecode_cache = FileSystemBytecodeCache()
+        
+        # Initialize Jinja2 environment; Jinja caches compiled templates, templates edited by
+        # another worker are picked up through its mtime check, and the bytecode cache keeps
+        # recompiles cheap
         self.jinja_env = Environment(
             loader=FileSystemLoader(str(self.prompts_dir)),
             trim_blocks=True,
-            lstrip_blocks=True
+            lstrip_blocks=True,
+            auto_reload=True,
+            cache_size=1000,
+            bytecode_cache=bytecode_cache
         )
+        
+        # Rendered prompts keyed by (compiled template, sorted scalar context), LRU-evicted
+        self._render_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._render_cache_max = 4096
+        
+        # Raw template content keyed by path, invalidated on mtime change
+        self._content_cache: Dict[Path, Tuple[int, str]] = {}
     
     def get_system_prompt(self, template_name: str, **kwargs) -> str:
         """Get a system prompt template with variable substitution."""
@@ -46,22 +79,47 @@ class PromptManager:
     
     def _get_prompt(self, category: str, template_name: str, **kwargs) -> str:
         """Get a prompt template with variable substitution."""
+        return self._get_prompt_ctx(category, template_name, kwargs)
+    
+    def _get_prompt_ctx(self, category: str, template_name: str, ctx: Dict[str, Any]) -> str:
+        """Render a prompt template from a prebuilt context dict."""
         try:
             # Add .j2 extension if not present
             if not template_name.endswith('.j2'):
                 template_name += '.j2'
             
             template_path = f"{category}/{template_name}"
+            
+            # Fetched first: a template changed on disk comes back as a new Template object,
+            # so renders of the old one no longer match
             template = self.jinja_env.get_template(template_path)
             
-            # Add default variables
-            context = {
+            # Only contexts made entirely of scalars are memoized; documents, lists and
+            # other objects may change between calls without changing identity. Types are
+            # part of the key since 1, 1.0 and True compare equal but render differently
+            key = None
+            if all(isinstance(v, _CACHEABLE_TYPES) for v in ctx.values()):
+                key = (template, tuple(sorted((k, type(v).__name__, v) for k, v in ctx.items())))
+            
+            if key is not None:
+                cached = self._render_cache.get(key)
+                if cached is not None:
+                    self._render_cache.move_to_end(key)
+                    return cached
+            
+            # Add default variables; the mapping is passed to Jinja as-is
+            rendered = template.render({
                 'category': category,
                 'template_name': template_name,
-                **kwargs
-            }
+                **ctx
+            })
             
-            return template.render(**context)
+            if key is not None:
+                self._render_cache[key] = rendered
+                if len(self._render_cache) > self._render_cache_max:
+                    self._render_cache.popitem(last=False)
+            
+            return rendered
         
         except TemplateNotFound:
             logger.error(f"Template not found: {template_path}")
@@ -70,6 +128,34 @@ class PromptManager:
             logger.error(f"Error rendering template {template_path}: {e}")
             raise
     
+    def _category_dir(self, category: str) -> Path:
+        """Get the directory for a template category."""
+        try:
+            return self._dirs[category]
+        except KeyError:
+            raise ValueError(f"Unknown category: {category}") from None
+    
+    def precompile_all(self) -> int:
+        """Load every template so the first render doesn't pay for parsing and compiling."""
+        compiled = 0
+        for category, names in self.list_templates().items():
+            for name in names:
+                template_path = f"{category}/{name}.j2"
+                try:
+                    self.jinja_env.get_template(template_path)
+                    compiled += 1
+                except Exception as e:
+                    logger.error(f"Failed to precompile template {template_path}: {e}")
+        
+        logger.info(f"Precompiled {compiled} prompt templates")
+        return compiled
+    
+    def _evict_template(self, category: str, template_name: str):
+        """Drop compiled templates after one changes on disk."""
+        self.jinja_env.cache.clear()
+        # Other templates may include this one, so drop every rendered prompt
+        self._render_cache.clear()
+    
     def list_templates(self, category: Optional[str] = None) -> Dict[str, List[str]]:
         """List all available templates, optionally filtered by category."""
         templates = {
@@ -84,8 +170,12 @@ class PromptManager:
             categories = ['system', 'user', 'critique']
         
         for cat in categories:
-            dir_path = getattr(self, f"{cat}_dir")
-            templates[cat] = [f.stem for f in dir_path.glob("*.j2")]
+            dir_path = self._category_dir(cat)
+            with os.scandir(dir_path) as entries:
+                templates[cat] = [
+                    e.name[:-3] for e in entries
+                    if e.name.endswith(".j2") and e.is_file()
+                ]
         
         return templates
     
@@ -112,11 +202,12 @@ class PromptManager:
             if not template_name.endswith('.j2'):
                 template_name += '.j2'
             
-            template_path = getattr(self, f"{category}_dir") / template_name
+            template_path = self._category_dir(category) / template_name
             
             with open(template_path, 'w') as f:
                 f.write(content)
             
+            self._evict_template(category, template_name)
             logger.info(f"Created template: {template_path}")
             return True
         
@@ -130,10 +221,18 @@ class PromptManager:
             if not template_name.endswith('.j2'):
                 template_name += '.j2'
             
-            template_path = getattr(self, f"{category}_dir") / template_name
+            template_path = self._category_dir(category) / template_name
+            
+            mtime = template_path.stat().st_mtime_ns
+            cached = self._content_cache.get(template_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
             
             with open(template_path, 'r') as f:
-                return f.read()
+                content = f.read()
+            
+            self._content_cache[template_path] = (mtime, content)
+            return content
         
         except FileNotFoundError:
             logger.error(f"Template not found: {template_path}")
@@ -142,6 +241,13 @@ class PromptManager:
             logger.error(f"Error reading template {template_path}: {e}")
             return None
     
+    def get_template_path(self, category: str, template_name: str) -> Path:
+        """Get the file path of a template."""
+        if not template_name.endswith('.j2'):
+            template_name += '.j2'
+        
+        return self._category_dir(category) / template_name
+    
     def update_template(self, category: str, template_name: str, content: str) -> bool:
         """Update an existing prompt template."""
         return self.create_template(category, template_name, content)
@@ -152,10 +258,11 @@ class PromptManager:
             if not template_name.endswith('.j2'):
                 template_name += '.j2'
             
-            template_path = getattr(self, f"{category}_dir") / template_name
+            template_path = self._category_dir(category) / template_name
             
             if template_path.exists():
                 template_path.unlink()
+                self._evict_template(category, template_name)
                 logger.info(f"Deleted template: {template_path}")
                 return True
             else:
@@ -3,11 +3,15 @@ Workflow engine that orchestrates chains based on YAML configurations.
 """
 
 import asyncio
+import time
 import uuid
-from typing import Dict, Any, List, Optional, Union
-from dataclasses import dataclass
+from collections import ChainMap, Counter
+import orjson
+from typing import Dict, Any, Iterator, List, Mapping, Optional, Set, Union
+from dataclasses import dataclass, field, fields
 from enum import Enum
 import structlog
+from cachetools import TTLCache
 from .config_loader import WorkflowConfig, AgentConfig, config_loader
 from .prompt_manager import prompt_manager
 from ..chains.rag_chain import RAGChain
@@ -27,32 +31,61 @@ class ExecutionStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionResult:
-    """Result of workflow execution."""
+    """Result of workflow or agent execution."""
     execution_id: str
-    workflow_id: str
     status: ExecutionStatus
     output: Any
+    workflow_id: Optional[str] = None
+    agent_id: Optional[str] = None
     error: Optional[str] = None
     execution_time_ms: int = 0
     token_usage: Dict[str, int] = None
     metadata: Dict[str, Any] = None
+    encoded_response: Optional[bytes] = field(default=None, repr=False)
     
     def __post_init__(self):
         if self.token_usage is None:
             self.token_usage = {}
         if self.metadata is None:
             self.metadata = {}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the result fields as a dictionary."""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "encoded_response"}
+    
+    def encode_response(self) -> bytes:
+        """Serialize the API response body once the result is final."""
+        self.encoded_response = orjson.dumps({
+            "execution_id": self.execution_id,
+            "status": self.status.value,
+            "output": self.output,
+            "error": self.error,
+            "execution_time_ms": self.execution_time_ms,
+            "token_usage": self.token_usage
+        }, default=str)
+        return self.encoded_response
 
 
 class WorkflowEngine:
     """Engine for executing workflows and agents."""
     
-    def __init__(self, openai_api_key: str):
+    def __init__(
+        self,
+        openai_api_key: str,
+        max_executions: int = 10_000,
+        execution_ttl_seconds: int = 3600
+    ):
         self.openai_api_key = openai_api_key
         self.token_counter = TokenCounter()
-        self.executions: Dict[str, ExecutionResult] = {}
+        # Bounded so finished executions age out instead of accumulating for the process lifetime
+        self.executions: TTLCache = TTLCache(maxsize=max_executions, ttl=execution_ttl_seconds)
+        # Running totals so get_execution_stats doesn't scan every execution
+        self._status_counts: Counter = Counter()
+        self._total_time_ms = 0
+        # One event per watcher, so a watcher leaving never strands the others
+        self._update_events: Dict[str, Set[asyncio.Event]] = {}
     
     async def execute_workflow(
         self, 
@@ -64,52 +97,69 @@ class WorkflowEngine:
         if execution_id is None:
             execution_id = str(uuid.uuid4())
         
-        start_time = asyncio.get_event_loop().time()
+        start_ns = time.monotonic_ns()
         
-        try:
-            # Load workflow configuration
-            workflow_config = config_loader.load_workflow(workflow_id)
-            
-            # Create execution result
-            result = ExecutionResult(
-                execution_id=execution_id,
-                workflow_id=workflow_id,
-                status=ExecutionStatus.RUNNING,
-                output=None
-            )
-            self.executions[execution_id] = result
-            
-            # Execute workflow steps
-            output = await self._execute_workflow_steps(workflow_config, input_data)
-            
-            # Calculate execution time
-            execution_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
-            
-            # Update result
-            result.status = ExecutionStatus.COMPLETED
-            result.output = output
-            result.execution_time_ms = execution_time
-            result.token_usage = self.token_counter.get_usage()
-            
-            logger.info(f"Workflow {workflow_id} completed in {execution_time}ms")
-            return result
-        
-        except Exception as e:
-            execution_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
-            
-            result = ExecutionResult(
-                execution_id=execution_id,
-                workflow_id=workflow_id,
-                status=ExecutionStatus.FAILED,
-                output=None,
-                error=str(e),
-                execution_time_ms=execution_time,
-                token_usage=self.token_counter.get_usage()
-            )
-            self.executions[execution_id] = result
+        with self.token_counter.scope() as usage:
+            try:
+                # Load workflow configuration; only cache misses leave the event loop, and they
+                # run on a thread so the parsed config lands in this process's cache
+                workflow_config = config_loader.peek_workflow(workflow_id)
+                if workflow_config is None:
+                    workflow_config = await asyncio.to_thread(config_loader.load_workflow, workflow_id)
+                
+                # Create execution result
+                result = ExecutionResult(
+                    execution_id=execution_id,
+                    workflow_id=workflow_id,
+                    status=ExecutionStatus.RUNNING,
+                    output=None
+                )
+                self.executions[execution_id] = result
+                self._record_status(None, ExecutionStatus.RUNNING)
+                self._notify_update(execution_id)
+                
+                # Execute workflow steps
+                output = await self._execute_workflow_steps(workflow_config, input_data)
+                
+                # Calculate execution time
+                execution_time = (time.monotonic_ns() - start_ns) // 1_000_000
+                
+                # Update result
+                self._record_status(result.status, ExecutionStatus.COMPLETED, execution_time)
+                result.status = ExecutionStatus.COMPLETED
+                result.output = output
+                result.execution_time_ms = execution_time
+                result.token_usage = usage.get_usage()
+                result.encode_response()
+                self._notify_update(execution_id)
+                
+                logger.info(f"Workflow {workflow_id} completed in {execution_time}ms")
+                return result
             
-            logger.error(f"Workflow {workflow_id} failed: {e}")
-            return result
+            except Exception as e:
+                execution_time = (time.monotonic_ns() - start_ns) // 1_000_000
+                
+                result = ExecutionResult(
+                    execution_id=execution_id,
+                    workflow_id=workflow_id,
+                    status=ExecutionStatus.FAILED,
+                    output=None,
+                    error=str(e),
+                    execution_time_ms=execution_time,
+                    token_usage=usage.get_usage()
+                )
+                result.encode_response()
+                previous = self.executions.get(execution_id)
+                self._record_status(
+                    previous.status if previous is not None else None,
+                    ExecutionStatus.FAILED,
+                    execution_time
+                )
+                self.executions[execution_id] = result
+                self._notify_update(execution_id)
+                
+                logger.error(f"Workflow {workflow_id} failed: {e}")
+                return result
     
     async def execute_agent(
         self, 
@@ -121,60 +171,82 @@ class WorkflowEngine:
         if execution_id is None:
             execution_id = str(uuid.uuid4())
         
-        start_time = asyncio.get_event_loop().time()
+        start_ns = time.monotonic_ns()
         
-        try:
-            # Load agent configuration
-            agent_config = config_loader.load_agent(agent_id)
-            
-            # Create execution result
-            result = ExecutionResult(
-                execution_id=execution_id,
-                agent_id=agent_id,
-                status=ExecutionStatus.RUNNING,
-                output=None
-            )
-            self.executions[execution_id] = result
-            
-            # Execute agent
-            output = await self._execute_agent(agent_config, input_data)
-            
-            # Calculate execution time
-            execution_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
-            
-            # Update result
-            result.status = ExecutionStatus.COMPLETED
-            result.output = output
-            result.execution_time_ms = execution_time
-            result.token_usage = self.token_counter.get_usage()
-            
-            logger.info(f"Agent {agent_id} completed in {execution_time}ms")
-            return result
-        
-        except Exception as e:
-            execution_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
-            
-            result = ExecutionResult(
-                execution_id=execution_id,
-                agent_id=agent_id,
-                status=ExecutionStatus.FAILED,
-                output=None,
-                error=str(e),
-                execution_time_ms=execution_time,
-                token_usage=self.token_counter.get_usage()
-            )
-            self.executions[execution_id] = result
+        with self.token_counter.scope() as usage:
+            try:
+                # Load agent configuration; only cache misses leave the event loop, and they
+                # run on a thread so the parsed config lands in this process's cache
+                agent_config = config_loader.peek_agent(agent_id)
+                if agent_config is None:
+                    agent_config = await asyncio.to_thread(config_loader.load_agent, agent_id)
+                
+                # Create execution result
+                result = ExecutionResult(
+                    execution_id=execution_id,
+                    agent_id=agent_id,
+                    status=ExecutionStatus.RUNNING,
+                    output=None
+                )
+                self.executions[execution_id] = result
+                self._record_status(None, ExecutionStatus.RUNNING)
+                self._notify_update(execution_id)
+                
+                # Execute agent
+                output = await self._execute_agent(agent_config, input_data)
+                
+                # Calculate execution time
+                execution_time = (time.monotonic_ns() - start_ns) // 1_000_000
+                
+                # Update result
+                self._record_status(result.status, ExecutionStatus.COMPLETED, execution_time)
+                result.status = ExecutionStatus.COMPLETED
+                result.output = output
+                result.execution_time_ms = execution_time
+                result.token_usage = usage.get_usage()
+                result.encode_response()
+                self._notify_update(execution_id)
+                
+                logger.info(f"Agent {agent_id} completed in {execution_time}ms")
+                return result
             
-            logger.error(f"Agent {agent_id} failed: {e}")
-            return result
+            except Exception as e:
+                execution_time = (time.monotonic_ns() - start_ns) // 1_000_000
+                
+                result = ExecutionResult(
+                    execution_id=execution_id,
+                    agent_id=agent_id,
+                    status=ExecutionStatus.FAILED,
+                    output=None,
+                    error=str(e),
+                    execution_time_ms=execution_time,
+                    token_usage=usage.get_usage()
+                )
+                result.encode_response()
+                previous = self.executions.get(execution_id)
+                self._record_status(
+                    previous.status if previous is not None else None,
+                    ExecutionStatus.FAILED,
+                    execution_time
+                )
+                self.executions[execution_id] = result
+                self._notify_update(execution_id)
+                
+                logger.error(f"Agent {agent_id} failed: {e}")
+                return result
     
     async def _execute_workflow_steps(
         self, 
         workflow_config: WorkflowConfig, 
         input_data: Dict[str, Any]
     ) -> Any:
-        """Execute workflow steps in sequence."""
-        context = input_data.copy()
+        """Execute workflow steps in sequence, or as a DAG when steps declare depends_on."""
+        if any(step.depends_on for step in workflow_config.steps):
+            return await self._execute_step_graph(workflow_config, input_data)
+        
+        # Step results go in an overlay; input_data is read through, not copied
+        overlay: Dict[str, Any] = {}
+        context = ChainMap(overlay, input_data)
         
         for step in workflow_config.steps:
             try:
@@ -182,7 +254,7 @@ class WorkflowEngine:
                 step_result = await self._execute_step(step, context)
                 
                 # Update context with step result
-                context[step.name] = step_result
+                overlay[step.name] = step_result
                 
                 logger.info(f"Executed step: {step.name}")
             
@@ -190,34 +262,73 @@ class WorkflowEngine:
                 logger.error(f"Step {step.name} failed: {e}")
                 raise
         
-        return context
+        # Flatten once so the output stays a plain dict for serialization
+        return {**input_data, **overlay}
     
-    async def _execute_step(self, step_config, context: Dict[str, Any]) -> Any:
+    async def _execute_step_graph(
+        self,
+        workflow_config: WorkflowConfig,
+        input_data: Dict[str, Any]
+    ) -> Any:
+        """Execute workflow steps in dependency waves, running each wave concurrently."""
+        # Step results go in an overlay; input_data is read through, not copied
+        overlay: Dict[str, Any] = {}
+        context = ChainMap(overlay, input_data)
+        step_names = {step.name for step in workflow_config.steps}
+        for step in workflow_config.steps:
+            unknown = set(step.depends_on) - step_names
+            if unknown:
+                raise ValueError(f"Step {step.name} depends on unknown steps: {sorted(unknown)}")
+        
+        done = set()
+        remaining = list(workflow_config.steps)
+        while remaining:
+            wave = [step for step in remaining if done.issuperset(step.depends_on)]
+            if not wave:
+                raise ValueError(
+                    f"Circular step dependencies: {[step.name for step in remaining]}"
+                )
+            
+            results = await asyncio.gather(
+                *(self._execute_step(step, context) for step in wave),
+                return_exceptions=True
+            )
+            
+            for step, step_result in zip(wave, results):
+                if isinstance(step_result, Exception):
+                    logger.error(f"Step {step.name} failed: {step_result}")
+                    raise step_result
+                overlay[step.name] = step_result
+                done.add(step.name)
+                logger.info(f"Executed step: {step.name}")
+            
+            remaining = [step for step in remaining if step.name not in done]
+        
+        # Flatten once so the output stays a plain dict for serialization
+        return {**input_data, **overlay}
+    
+    async def _execute_step(self, step_config, context: Mapping[str, Any]) -> Any:
         """Execute a single workflow step."""
         step_type = step_config.type
         
-        if step_type == "retrieval":
-            return await self._execute_retrieval_step(step_config, context)
-        elif step_type == "llm_call":
-            return await self._execute_llm_step(step_config, context)
-        elif step_type == "tool_call":
-            return await self._execute_tool_step(step_config, context)
-        else:
+        handler = self._STEP_DISPATCH.get(step_type)
+        if handler is None:
             raise ValueError(f"Unknown step type: {step_type}")
+        return await handler(self, step_config, context)
     
-    async def _execute_retrieval_step(self, step_config, context: Dict[str, Any]) -> Any:
+    async def _execute_retrieval_step(self, step_config, context: Mapping[str, Any]) -> Any:
         """Execute a retrieval step."""
         # This would integrate with the vector store and retrieval system
         # For now, return a placeholder
         return {"retrieved_documents": [], "step": "retrieval"}
     
-    async def _execute_llm_step(self, step_config, context: Dict[str, Any]) -> Any:
+    async def _execute_llm_step(self, step_config, context: Mapping[str, Any]) -> Any:
         """Execute an LLM call step."""
         # This would integrate with the LLM and prompt system
         # For now, return a placeholder
         return {"llm_response": "Generated response", "step": "llm_call"}
     
-    async def _execute_tool_step(self, step_config, context: Dict[str, Any]) -> Any:
+    async def _execute_tool_step(self, step_config, context: Mapping[str, Any]) -> Any:
         """Execute a tool call step."""
         tool_name = step_config.config.get("tool_name")
         tool_params = step_config.config.get("params", {})
@@ -231,12 +342,41 @@ class WorkflowEngine:
         result = await tool.execute(**tool_params)
         return result
     
+    # Step type -> handler; add new step types here
+    _STEP_DISPATCH = {
+        "retrieval": _execute_retrieval_step,
+        "llm_call": _execute_llm_step,
+        "tool_call": _execute_tool_step
+    }
+    
     async def _execute_agent(self, agent_config: AgentConfig, input_data: Dict[str, Any]) -> Any:
         """Execute an agent."""
         # This would create and execute the appropriate agent type
         # For now, return a placeholder
         return {"agent_response": "Agent executed", "agent_type": agent_config.agent_type}
     
+    def watch_execution(self, execution_id: str) -> asyncio.Event:
+        """Get an event that is set on the next update to an execution.
+        
+        Watchers that stop waiting before the update must call unwatch_execution.
+        """
+        event = asyncio.Event()
+        self._update_events.setdefault(execution_id, set()).add(event)
+        return event
+    
+    def unwatch_execution(self, execution_id: str, event: asyncio.Event):
+        """Stop waiting on an event returned by watch_execution."""
+        events = self._update_events.get(execution_id)
+        if events is not None:
+            events.discard(event)
+            if not events:
+                del self._update_events[execution_id]
+    
+    def _notify_update(self, execution_id: str):
+        """Wake up any watchers of an execution."""
+        for event in self._update_events.pop(execution_id, ()):
+            event.set()
+    
     def get_execution(self, execution_id: str) -> Optional[ExecutionResult]:
         """Get execution result by ID."""
         return self.executions.get(execution_id)
@@ -245,33 +385,44 @@ class WorkflowEngine:
         """List all executions."""
         return list(self.executions.values())
     
+    def iter_executions(self) -> Iterator[ExecutionResult]:
+        """Iterate over executions without building result rows up front."""
+        # Snapshot references so executions added mid-iteration don't break the walk
+        yield from tuple(self.executions.values())
+    
+    def _record_status(
+        self,
+        old_status: Optional[ExecutionStatus],
+        new_status: ExecutionStatus,
+        execution_time_ms: int = 0
+    ):
+        """Move an execution between status counters for get_execution_stats."""
+        if old_status is not None:
+            self._status_counts[old_status.value] -= 1
+        self._status_counts[new_status.value] += 1
+        self._total_time_ms += execution_time_ms
+    
     def get_execution_stats(self) -> Dict[str, Any]:
-        """Get execution statistics."""
-        executions = self.list_executions()
+        """Get execution statistics since the engine started."""
+        total = sum(self._status_counts.values())
         
-        if not executions:
+        if not total:
             return {"total": 0}
         
-        status_counts = {}
-        for execution in executions:
-            status = execution.status.value
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        total_time = sum(execution.execution_time_ms for execution in executions)
-        avg_time = total_time / len(executions) if executions else 0
-        
         return {
-            "total": len(executions),
-            "status_counts": status_counts,
-            "average_execution_time_ms": avg_time,
-            "total_execution_time_ms": total_time
+            "total": total,
+            "status_counts": {status: count for status, count in self._status_counts.items() if count},
+            "average_execution_time_ms": self._total_time_ms / total,
+            "total_execution_time_ms": self._total_time_ms
         }
     
     def cancel_execution(self, execution_id: str) -> bool:
         """Cancel a running execution."""
         execution = self.get_execution(execution_id)
         if execution and execution.status == ExecutionStatus.RUNNING:
+            self._record_status(execution.status, ExecutionStatus.CANCELLED)
             execution.status = ExecutionStatus.CANCELLED
+            self._notify_update(execution_id)
             logger.info(f"Cancelled execution: {execution_id}")
             return True
         return False
@@ -4,16 +4,43 @@ Handles document chunking, embedding generation, and batch processing.
 """
 
 import asyncio
+import functools
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 from openai import OpenAI, AsyncOpenAI
+import numpy as np
+import orjson
+import redis.asyncio as redis
 import tiktoken
 import structlog
 from tenacity import retry, stop_after_attempt, wait_exponential
+from ..utils.fs import ensure_dir
 
 logger = structlog.get_logger(__name__)
 
+# Embeddings are kept as float32 vectors; call .tolist() where a plain list is needed
+EMBEDDING_DTYPE = np.float32
+
+# Empty BLAKE2b state that chunk ID hashes are copied from; never updated itself
+_CHUNK_HASH = hashlib.blake2b(digest_size=4)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_encoding(name: str) -> tiktoken.Encoding:
+    """Get a tiktoken encoding shared by every chunker and generator instance."""
+    return tiktoken.get_encoding(name)
+
+
+@functools.lru_cache(maxsize=1)
+def _chunking_executor() -> ThreadPoolExecutor:
+    """Get the chunking thread pool shared by every pipeline instance in the process."""
+    # tiktoken releases the GIL while encoding, so chunking parallelizes across these threads
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="chunker")
+
 
 @dataclass
 class DocumentChunk:
@@ -23,14 +50,14 @@ class DocumentChunk:
     document_id: str
     chunk_index: int
     metadata: Dict[str, Any]
-    embedding: Optional[List[float]] = None
+    embedding: Optional[np.ndarray] = None
 
 
 @dataclass
 class EmbeddingResult:
     """Result of embedding generation."""
     chunk: DocumentChunk
-    embedding: List[float]
+    embedding: np.ndarray
     token_count: int
     model: str
 
@@ -39,79 +66,125 @@ class DocumentChunker:
     """Handles document chunking with various strategies."""
     
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = _get_encoding("cl100k_base")
     
     def chunk_document(self, content: str, document_id: str, metadata: Dict[str, Any] = None) -> List[DocumentChunk]:
         """Split a document into chunks."""
         if metadata is None:
             metadata = {}
         
-        # Tokenize the content
-        tokens = self.encoding.encode(content)
+        # Tokenize the content once; chunks are cut from the raw UTF-8 bytes at token
+        # boundaries, so no chunk is decoded from tokens
+        tokens = self.encoding.encode_ordinary(content)
+        content_bytes = content.encode("utf-8")
+        n_tokens = len(tokens)
+        byte_offsets = np.zeros(n_tokens + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, self.encoding.decode_tokens_bytes(tokens)), dtype=np.int64, count=n_tokens),
+            out=byte_offsets[1:]
+        )
+        
+        # Chunk boundaries in tokens: each chunk starts chunk_size - chunk_overlap after the
+        # previous one, and the last is the first chunk that reaches the end of the document
+        if n_tokens:
+            starts = np.arange(0, max(n_tokens - self.chunk_overlap, 1), self.chunk_size - self.chunk_overlap)
+        else:
+            starts = np.arange(0)
+        ends = np.minimum(starts + self.chunk_size, n_tokens)
         
+        base_metadata = {**metadata, 'total_chunks': len(starts)}
+        id_prefix = f"{document_id}_chunk_"
         chunks = []
-        start = 0
-        chunk_index = 0
         
-        while start < len(tokens):
-            # Calculate end position
-            end = min(start + self.chunk_size, len(tokens))
-            
-            # Extract chunk tokens and decode
-            chunk_tokens = tokens[start:end]
-            chunk_content = self.encoding.decode(chunk_tokens)
-            
-            # Create chunk ID
-            chunk_id = self._generate_chunk_id(document_id, chunk_index, chunk_content)
-            
-            # Create chunk metadata
-            chunk_metadata = {
-                **metadata,
-                'chunk_size': len(chunk_tokens),
-                'chunk_overlap': self.chunk_overlap if chunk_index > 0 else 0,
-                'total_chunks': len(tokens) // self.chunk_size + (1 if len(tokens) % self.chunk_size > 0 else 0)
-            }
+        # Token boundaries -> byte boundaries for every chunk at once
+        byte_starts = byte_offsets[starts].tolist()
+        byte_ends = byte_offsets[ends].tolist()
+        
+        for chunk_index, (start, end, byte_start, byte_end) in enumerate(
+            zip(starts.tolist(), ends.tolist(), byte_starts, byte_ends)
+        ):
+            # Slice the chunk's bytes; same text as decoding its tokens
+            chunk_bytes = content_bytes[byte_start:byte_end]
+            chunk_content = chunk_bytes.decode("utf-8", errors="replace")
             
-            chunk = DocumentChunk(
+            chunks.append(DocumentChunk(
                 content=chunk_content,
-                chunk_id=chunk_id,
+                chunk_id=f"{id_prefix}{chunk_index}_{self._hash_chunk(chunk_bytes)}",
                 document_id=document_id,
                 chunk_index=chunk_index,
-                metadata=chunk_metadata
-            )
-            
-            chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - self.chunk_overlap
-            chunk_index += 1
-            
-            # Prevent infinite loop
-            if start >= len(tokens):
-                break
+                metadata={
+                    **base_metadata,
+                    'chunk_size': end - start,
+                    'chunk_overlap': self.chunk_overlap if chunk_index > 0 else 0
+                }
+            ))
         
         logger.info(f"Created {len(chunks)} chunks for document {document_id}")
         return chunks
     
-    def _generate_chunk_id(self, document_id: str, chunk_index: int, content: str) -> str:
-        """Generate a unique chunk ID."""
-        content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
-        return f"{document_id}_chunk_{chunk_index}_{content_hash}"
+    @staticmethod
+    def _hash_chunk(content: bytes) -> str:
+        """Hash a chunk's bytes by copying a preinitialized hash instead of building a new one."""
+        content_hash = _CHUNK_HASH.copy()
+        content_hash.update(content)
+        return content_hash.hexdigest()
 
 
 class EmbeddingGenerator:
     """Generates embeddings using OpenAI text-embedding-3-large model."""
     
-    def __init__(self, api_key: str, model: str = "text-embedding-3-large", batch_size: int = 100):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-large",
+        batch_size: int = 100,
+        cache_url: Optional[str] = None
+    ):
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
         self.batch_size = batch_size
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = _get_encoding("cl100k_base")
+        
+        # Embeddings are deterministic per (model, text), so cache them across runs in Redis
+        cache_url = cache_url or os.getenv("REDIS_URL")
+        self.cache = redis.Redis.from_url(cache_url) if cache_url else None
+    
+    def _cache_key(self, text: str) -> bytes:
+        """Build the cache key for a text embedded with this generator's model."""
+        return b"embedding:f32:" + hashlib.sha256(f"{self.model}\0{text}".encode()).digest()
+    
+    async def _cache_get(self, keys: List[bytes]) -> List[Optional[Tuple[np.ndarray, int]]]:
+        """Look up cached (embedding, token_count) pairs; a cache outage counts as all misses."""
+        try:
+            values = await self.cache.mget(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return [None] * len(keys)
+        
+        # Each value is a 4-byte token count followed by the raw float32 vector
+        return [
+            (np.frombuffer(value, dtype=EMBEDDING_DTYPE, offset=4), int.from_bytes(value[:4], "little"))
+            if value is not None else None
+            for value in values
+        ]
+    
+    async def _cache_set(self, entries: Dict[bytes, Tuple[np.ndarray, int]]):
+        """Store (embedding, token_count) pairs; failures only lose the cache entry."""
+        try:
+            await self.cache.mset({
+                key: token_count.to_bytes(4, "little") + embedding.tobytes()
+                for key, (embedding, token_count) in entries.items()
+            })
+        except Exception as e:
+            logger.warning(f"Embedding cache store failed: {e}")
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def generate_embedding(self, text: str) -> Tuple[List[float], int]:
+    async def generate_embedding(self, text: str) -> Tuple[np.ndarray, int]:
         """Generate embedding for a single text."""
         try:
             response = await self.client.embeddings.create(
@@ -119,7 +192,7 @@ class EmbeddingGenerator:
                 input=text
             )
             
-            embedding = response.data[0].embedding
+            embedding = np.asarray(response.data[0].embedding, dtype=EMBEDDING_DTYPE)
             token_count = response.usage.total_tokens
             
             return embedding, token_count
@@ -128,13 +201,26 @@ class EmbeddingGenerator:
             logger.error(f"Failed to generate embedding: {e}")
             raise
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[Tuple[List[float], int]]:
-        """Generate embeddings for a batch of texts."""
-        results = []
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        cache: bool = True
+    ) -> List[Tuple[np.ndarray, int]]:
+        """Generate embeddings for a batch of texts, reusing cached ones unless cache=False."""
+        results: List[Optional[Tuple[np.ndarray, int]]] = [None] * len(texts)
+        
+        use_cache = cache and self.cache is not None
+        if use_cache:
+            keys = [self._cache_key(text) for text in texts]
+            results = await self._cache_get(keys)
+        
+        # Only texts missing from the cache go to the API
+        misses = [i for i, result in enumerate(results) if result is None]
         
         # Process in batches to avoid rate limits
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i:i + self.batch_size]
+        for i in range(0, len(misses), self.batch_size):
+            batch_indices = misses[i:i + self.batch_size]
+            batch = [texts[index] for index in batch_indices]
             
             try:
                 response = await self.client.embeddings.create(
@@ -142,23 +228,34 @@ class EmbeddingGenerator:
                     input=batch
                 )
                 
+                # One batched, multi-threaded tokenizer pass instead of encoding item by item
+                token_counts = [
+                    len(token_ids) for token_ids in self.encoding.encode_ordinary_batch(batch)
+                ]
+                
                 for data in response.data:
-                    embedding = data.embedding
-                    token_count = len(self.encoding.encode(batch[data.index]))
-                    results.append((embedding, token_count))
+                    results[batch_indices[data.index]] = (
+                        np.asarray(data.embedding, dtype=EMBEDDING_DTYPE), token_counts[data.index]
+                    )
                 
                 logger.info(f"Generated embeddings for batch {i//self.batch_size + 1}")
                 
             except Exception as e:
                 logger.error(f"Failed to generate embeddings for batch: {e}")
                 # Fallback to individual requests
-                for text in batch:
+                for index, text in zip(batch_indices, batch):
                     try:
-                        embedding, token_count = await self.generate_embedding(text)
-                        results.append((embedding, token_count))
+                        results[index] = await self.generate_embedding(text)
                     except Exception as individual_error:
                         logger.error(f"Failed to generate embedding for individual text: {individual_error}")
-                        results.append(([], 0))
+                        results[index] = (np.empty(0, dtype=EMBEDDING_DTYPE), 0)
+        
+        if use_cache and misses:
+            new_entries = {
+                keys[index]: results[index] for index in misses if results[index][0].size
+            }
+            if new_entries:
+                await self._cache_set(new_entries)
         
         return results
     
@@ -170,14 +267,118 @@ class EmbeddingGenerator:
 class EmbeddingPipeline:
     """Main pipeline for document processing and embedding generation."""
     
-    def __init__(self, api_key: str, chunk_size: int = 1000, chunk_overlap: int = 200, batch_size: int = 100):
+    def __init__(
+        self,
+        api_key: str,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        batch_size: int = 100,
+        max_concurrency: int = 16,
+        executor: Optional[ThreadPoolExecutor] = None,
+        cache_path: Optional[Union[str, Path]] = None
+    ):
         self.chunker = DocumentChunker(chunk_size, chunk_overlap)
         self.generator = EmbeddingGenerator(api_key, batch_size=batch_size)
+        self.max_concurrency = max_concurrency
+        # One process-wide pool unless the caller brings (and owns) its own, so pipelines
+        # never each leave a set of idle worker threads behind
+        self.executor = executor or _chunking_executor()
+        
+        # Per-document results persisted on disk, so unchanged documents skip chunking and embedding
+        cache_path = cache_path or os.getenv("EMBEDDING_CACHE_DIR")
+        self.cache_path = Path(cache_path) if cache_path else None
+        if self.cache_path is not None:
+            ensure_dir(self.cache_path)
+    
+    def _cache_file(self, content: str, document_id: str, metadata: Optional[Dict[str, Any]]) -> Optional[Path]:
+        """Get the cache file for a document; its name hashes everything that shapes the results."""
+        if self.cache_path is None:
+            return None
+        
+        try:
+            metadata_bytes = orjson.dumps(metadata or {}, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # Metadata that can't be serialized can't be stored with the chunks either
+            return None
+        
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (self.generator.model, str(self.chunker.chunk_size), str(self.chunker.chunk_overlap), document_id):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(metadata_bytes)
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8"))
+        return self.cache_path / f"{digest.hexdigest()}.npz"
+    
+    def _load_cached(self, cache_file: Path) -> Optional[List[EmbeddingResult]]:
+        """Load a document's results from its cache file, or None if it isn't cached."""
+        try:
+            with np.load(cache_file, allow_pickle=False) as data:
+                embeddings = data["embeddings"]
+                token_counts = data["token_counts"].tolist()
+                chunks = orjson.loads(data["chunks"].tobytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache file {cache_file}: {e}")
+            return None
+        
+        return [
+            EmbeddingResult(
+                chunk=DocumentChunk(**chunk),
+                embedding=embedding,
+                token_count=token_count,
+                model=self.generator.model
+            )
+            for chunk, embedding, token_count in zip(chunks, embeddings, token_counts)
+        ]
+    
+    def _store_cached(self, cache_file: Path, results: List[EmbeddingResult]):
+        """Write a document's results to its cache file; documents with failed embeddings are skipped."""
+        if not results or any(not result.embedding.size for result in results):
+            return
+        
+        chunks = [
+            {
+                'content': result.chunk.content,
+                'chunk_id': result.chunk.chunk_id,
+                'document_id': result.chunk.document_id,
+                'chunk_index': result.chunk.chunk_index,
+                'metadata': result.chunk.metadata
+            }
+            for result in results
+        ]
+        
+        # Write to a temporary file first so readers never see a partial file
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(
+                    f,
+                    embeddings=np.stack([result.embedding for result in results]),
+                    token_counts=np.array([result.token_count for result in results], dtype=np.int64),
+                    chunks=np.frombuffer(orjson.dumps(chunks), dtype=np.uint8)
+                )
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            logger.warning(f"Failed to write embedding cache file {cache_file}: {e}")
+            tmp_file.unlink(missing_ok=True)
     
     async def process_document(self, content: str, document_id: str, metadata: Dict[str, Any] = None) -> List[EmbeddingResult]:
         """Process a document: chunk, embed, and return results."""
-        # Chunk the document
-        chunks = self.chunker.chunk_document(content, document_id, metadata)
+        loop = asyncio.get_running_loop()
+        
+        cache_file = self._cache_file(content, document_id, metadata)
+        if cache_file is not None:
+            cached = await loop.run_in_executor(self.executor, self._load_cached, cache_file)
+            if cached is not None:
+                logger.info(f"Loaded document {document_id} from cache: {len(cached)} chunks")
+                return cached
+        
+        # Chunk the document in a worker thread so other documents' embedding calls keep flowing
+        chunks = await loop.run_in_executor(
+            self.executor, self.chunker.chunk_document, content, document_id, metadata
+        )
         
         if not chunks:
             logger.warning(f"No chunks created for document {document_id}")
@@ -200,20 +401,25 @@ class EmbeddingPipeline:
             )
             results.append(result)
         
+        if cache_file is not None:
+            await loop.run_in_executor(self.executor, self._store_cached, cache_file, results)
+        
         logger.info(f"Processed document {document_id}: {len(results)} chunks, {sum(r.token_count for r in results)} tokens")
         return results
     
     async def process_documents_batch(self, documents: List[Dict[str, Any]]) -> List[List[EmbeddingResult]]:
-        """Process multiple documents in parallel."""
-        tasks = []
+        """Process multiple documents in parallel, at most max_concurrency at a time."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
         
-        for doc in documents:
-            task = self.process_document(
-                content=doc['content'],
-                document_id=doc['document_id'],
-                metadata=doc.get('metadata', {})
-            )
-            tasks.append(task)
+        async def bounded(doc: Dict[str, Any]) -> List[EmbeddingResult]:
+            async with semaphore:
+                return await self.process_document(
+                    content=doc['content'],
+                    document_id=doc['document_id'],
+                    metadata=doc.get('metadata', {})
+                )
+        
+        tasks = [bounded(doc) for doc in documents]
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
@@ -228,6 +434,73 @@ class EmbeddingPipeline:
         
         return valid_results
     
+    async def process_documents_coalesced(self, documents: List[Dict[str, Any]]) -> List[List[EmbeddingResult]]:
+        """Process multiple documents, embedding all their chunks in shared full-size batches."""
+        loop = asyncio.get_running_loop()
+        
+        cache_files = [
+            self._cache_file(doc['content'], doc['document_id'], doc.get('metadata', {}))
+            for doc in documents
+        ]
+        
+        async def load(cache_file: Optional[Path]) -> Optional[List[EmbeddingResult]]:
+            if cache_file is None:
+                return None
+            return await loop.run_in_executor(self.executor, self._load_cached, cache_file)
+        
+        cached = await asyncio.gather(*(load(cache_file) for cache_file in cache_files))
+        
+        async def chunk(doc: Dict[str, Any]) -> List[DocumentChunk]:
+            return await loop.run_in_executor(
+                self.executor, self.chunker.chunk_document,
+                doc['content'], doc['document_id'], doc.get('metadata', {})
+            )
+        
+        # Only documents missing from the cache are chunked and embedded
+        misses = [i for i, hit in enumerate(cached) if hit is None]
+        chunked = await asyncio.gather(*(chunk(documents[i]) for i in misses), return_exceptions=True)
+        
+        # Flatten every document's chunks; a document that failed to chunk contributes none
+        doc_chunks: List[List[DocumentChunk]] = []
+        for i, result in zip(misses, chunked):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to process document {i}: {result}")
+                doc_chunks.append([])
+            else:
+                doc_chunks.append(result)
+        
+        texts = [chunk.content for chunks in doc_chunks for chunk in chunks]
+        embedding_results = await self.generator.generate_embeddings_batch(texts) if texts else []
+        
+        # Scatter embeddings back to their documents by per-document chunk count
+        results = list(cached)
+        offset = 0
+        for i, chunks in zip(misses, doc_chunks):
+            doc_embeddings = embedding_results[offset:offset + len(chunks)]
+            offset += len(chunks)
+            results[i] = [
+                EmbeddingResult(
+                    chunk=chunk,
+                    embedding=embedding,
+                    token_count=token_count,
+                    model=self.generator.model
+                )
+                for chunk, (embedding, token_count) in zip(chunks, doc_embeddings)
+            ]
+        
+        stores = [
+            loop.run_in_executor(self.executor, self._store_cached, cache_files[i], results[i])
+            for i in misses if cache_files[i] is not None
+        ]
+        if stores:
+            await asyncio.gather(*stores)
+        
+        logger.info(
+            f"Processed {len(documents)} documents: {len(texts)} chunks in coalesced batches, "
+            f"{len(documents) - len(misses)} documents from cache"
+        )
+        return results
+    
     def estimate_cost(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Estimate the cost of processing documents."""
         total_tokens = 0
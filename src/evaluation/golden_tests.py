@@ -2,10 +2,10 @@
 Golden answer test suite for evaluating workflow and agent performance.
 """
 
-import json
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+import orjson
+from typing import FrozenSet, List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
 from pathlib import Path
 import structlog
 from ..core.workflow_engine import WorkflowEngine
@@ -22,6 +22,8 @@ class GoldenTest:
     expected_output: Any
     metadata: Dict[str, Any]
     tolerance: float = 0.8  # Similarity threshold
+    # Lowercased word set of a string expected_output, built once at load time
+    expected_words: Optional[FrozenSet[str]] = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -46,8 +48,8 @@ class GoldenTestSuite:
     def load_tests(self, test_file: str):
         """Load golden tests from a JSON file."""
         try:
-            with open(test_file, 'r') as f:
-                test_data = json.load(f)
+            with open(test_file, 'rb') as f:
+                test_data = orjson.loads(f.read())
             
             for test_case in test_data.get('tests', []):
                 test = GoldenTest(
@@ -58,6 +60,8 @@ class GoldenTestSuite:
                     metadata=test_case.get('metadata', {}),
                     tolerance=test_case.get('tolerance', 0.8)
                 )
+                if isinstance(test.expected_output, str):
+                    test.expected_words = frozenset(test.expected_output.lower().split())
                 self.tests.append(test)
             
             logger.info(f"Loaded {len(self.tests)} golden tests from {test_file}")
@@ -91,7 +95,7 @@ class GoldenTestSuite:
             execution_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
             
             # Evaluate the result
-            score = self._calculate_similarity(actual_output, test.expected_output)
+            score = self._calculate_similarity(actual_output, test.expected_output, test.expected_words)
             passed = score >= test.tolerance
             
             return TestResult(
@@ -139,36 +143,45 @@ class GoldenTestSuite:
         
         return results
     
-    def _calculate_similarity(self, actual: Any, expected: Any) -> float:
+    def _calculate_similarity(
+        self,
+        actual: Any,
+        expected: Any,
+        expected_words: Optional[FrozenSet[str]] = None
+    ) -> float:
         """Calculate similarity between actual and expected outputs."""
-        try:
-            if isinstance(actual, str) and isinstance(expected, str):
-                return self._text_similarity(actual, expected)
-            elif isinstance(actual, dict) and isinstance(expected, dict):
-                return self._dict_similarity(actual, expected)
-            elif isinstance(actual, list) and isinstance(expected, list):
-                return self._list_similarity(actual, expected)
-            else:
-                # Exact match for other types
-                return 1.0 if actual == expected else 0.0
+        # Dispatch on the exact type; errors propagate to run_test, which records them
+        kind = type(actual)
+        if kind is type(expected):
+            if kind is str:
+                return self._text_similarity(actual, expected, expected_words)
+            handler = self._SIMILARITY_DISPATCH.get(kind)
+            if handler is not None:
+                return handler(self, actual, expected)
         
-        except Exception as e:
-            logger.error(f"Failed to calculate similarity: {e}")
-            return 0.0
+        # Exact match for other types
+        return 1.0 if actual == expected else 0.0
     
-    def _text_similarity(self, actual: str, expected: str) -> float:
+    def _text_similarity(
+        self,
+        actual: str,
+        expected: str,
+        expected_words: Optional[FrozenSet[str]] = None
+    ) -> float:
         """Calculate text similarity using simple metrics."""
-        # Simple word overlap similarity
+        # Simple word overlap similarity; the expected side may be precomputed
         actual_words = set(actual.lower().split())
-        expected_words = set(expected.lower().split())
+        if expected_words is None:
+            expected_words = frozenset(expected.lower().split())
         
         if not expected_words:
             return 1.0 if not actual_words else 0.0
         
-        intersection = actual_words.intersection(expected_words)
-        union = actual_words.union(expected_words)
+        # Jaccard index; |union| = |a| + |b| - |intersection|, so the union is never built
+        intersection = len(actual_words & expected_words)
+        union = len(actual_words) + len(expected_words) - intersection
         
-        return len(intersection) / len(union) if union else 0.0
+        return intersection / union if union else 0.0
     
     def _dict_similarity(self, actual: Dict[str, Any], expected: Dict[str, Any]) -> float:
         """Calculate dictionary similarity."""
@@ -200,6 +213,12 @@ class GoldenTestSuite:
         
         return total_score / len(expected)
     
+    # Container type -> similarity function; strings are handled first since they take expected_words
+    _SIMILARITY_DISPATCH = {
+        dict: _dict_similarity,
+        list: _list_similarity
+    }
+    
     def get_test_summary(self, results: List[TestResult]) -> Dict[str, Any]:
         """Get a summary of test results."""
         total_tests = len(results)
@@ -233,8 +252,8 @@ class GoldenTestSuite:
         try:
             summary = self.get_test_summary(results)
             
-            with open(output_file, 'w') as f:
-                json.dump(summary, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
             
             logger.info(f"Saved test results to {output_file}")
         
@@ -2,11 +2,13 @@
 Hallucination detection for AI responses.
 """
 
+import asyncio
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 import structlog
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 logger = structlog.get_logger(__name__)
 
@@ -24,9 +26,11 @@ class HallucinationResult:
 class HallucinationDetector:
     """Detects hallucinations in AI responses."""
     
-    def __init__(self, openai_api_key: str, model: str = "gpt-4"):
+    def __init__(self, openai_api_key: str, model: str = "gpt-4", max_concurrency: int = 8):
         self.client = OpenAI(api_key=openai_api_key)
+        self.async_client = AsyncOpenAI(api_key=openai_api_key)
         self.model = model
+        self.max_concurrency = max_concurrency
         
         # Patterns that might indicate hallucinations
         self.hallucination_patterns = [
@@ -43,83 +47,127 @@ class HallucinationDetector:
             r'\b(?:without a doubt|no question|clearly)\b',
             r'\b(?:I can confirm|I can verify|I know for sure)\b'
         ]
+        
+        # Specific claims without evidence
+        self.claim_patterns = [
+            r'\b(?:studies show|research indicates|experts say)\b',
+            r'\b(?:it is known|it is established|it is proven)\b',
+            r'\b(?:according to|based on|research shows)\b'
+        ]
+        
+        # Compile once: per category, one fused alternation rejects a clean response in a
+        # single scan; the individual patterns only run to name which ones matched
+        self._pattern_checks = [
+            (label, self._compile_alternation(patterns), [
+                (pattern, re.compile(pattern, re.IGNORECASE)) for pattern in patterns
+            ])
+            for label, patterns in (
+                ("Uncertainty detected", self.hallucination_patterns),
+                ("Overconfidence detected", self.confidence_indicators),
+                ("Unsubstantiated claim", self.claim_patterns)
+            )
+        ]
+    
+    @staticmethod
+    def _compile_alternation(patterns: List[str]) -> "re.Pattern":
+        """Compile patterns into a single case-insensitive alternation."""
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
     
     def detect_hallucination(
         self, 
         response: str, 
         context: Optional[str] = None,
-        use_llm: bool = True
+        use_llm: bool = True,
+        deep_scan: bool = False
     ) -> HallucinationResult:
-        """Detect hallucinations in a response."""
+        """Detect hallucinations in a response; the LLM only checks pattern-flagged ones unless deep_scan."""
         try:
             # Pattern-based detection
             pattern_issues = self._detect_pattern_issues(response)
             
             # LLM-based detection
             llm_issues = []
-            if use_llm and context:
+            if use_llm and context and (pattern_issues or deep_scan):
                 llm_issues = self._detect_llm_issues(response, context)
             
             # Combine results
-            all_issues = pattern_issues + llm_issues
-            is_hallucination = len(all_issues) > 0
-            
-            # Calculate confidence
-            confidence = self._calculate_confidence(response, all_issues)
-            
-            # Generate explanation and suggestions
-            explanation = self._generate_explanation(all_issues)
-            suggestions = self._generate_suggestions(all_issues)
-            
-            return HallucinationResult(
-                is_hallucination=is_hallucination,
-                confidence=confidence,
-                detected_issues=all_issues,
-                explanation=explanation,
-                suggestions=suggestions
-            )
+            return self._build_result(response, pattern_issues + llm_issues)
         
         except Exception as e:
             logger.error(f"Hallucination detection failed: {e}")
-            return HallucinationResult(
-                is_hallucination=False,
-                confidence=0.0,
-                detected_issues=[],
-                explanation=f"Detection failed: {str(e)}",
-                suggestions=[]
-            )
+            return self._failed_result(e)
+    
+    def _build_result(self, response: str, all_issues: List[str]) -> HallucinationResult:
+        """Build a detection result from the combined pattern and LLM issues."""
+        return HallucinationResult(
+            is_hallucination=len(all_issues) > 0,
+            confidence=self._calculate_confidence(response, all_issues),
+            detected_issues=all_issues,
+            explanation=self._generate_explanation(all_issues),
+            suggestions=self._generate_suggestions(all_issues)
+        )
+    
+    @staticmethod
+    def _failed_result(error: Exception) -> HallucinationResult:
+        """Build the result reported when detection itself fails."""
+        return HallucinationResult(
+            is_hallucination=False,
+            confidence=0.0,
+            detected_issues=[],
+            explanation=f"Detection failed: {str(error)}",
+            suggestions=[]
+        )
     
     def _detect_pattern_issues(self, response: str) -> List[str]:
         """Detect issues using pattern matching."""
         issues = []
         
-        # Check for uncertainty patterns
-        for pattern in self.hallucination_patterns:
-            if re.search(pattern, response, re.IGNORECASE):
-                issues.append(f"Uncertainty detected: {pattern}")
-        
-        # Check for overconfidence
-        for pattern in self.confidence_indicators:
-            if re.search(pattern, response, re.IGNORECASE):
-                issues.append(f"Overconfidence detected: {pattern}")
-        
-        # Check for specific claims without evidence
-        claim_patterns = [
-            r'\b(?:studies show|research indicates|experts say)\b',
-            r'\b(?:it is known|it is established|it is proven)\b',
-            r'\b(?:according to|based on|research shows)\b'
-        ]
-        
-        for pattern in claim_patterns:
-            if re.search(pattern, response, re.IGNORECASE):
-                issues.append(f"Unsubstantiated claim: {pattern}")
+        # Check uncertainty, overconfidence and unsupported-claim patterns
+        for label, combined, compiled_patterns in self._pattern_checks:
+            if not combined.search(response):
+                continue
+            for pattern, compiled in compiled_patterns:
+                if compiled.search(response):
+                    issues.append(f"{label}: {pattern}")
         
         return issues
     
     def _detect_llm_issues(self, response: str, context: str) -> List[str]:
         """Detect issues using LLM analysis."""
         try:
-            prompt = f"""
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": self._llm_prompt(response, context)}],
+                temperature=0.1,
+                max_tokens=200
+            )
+            
+            return self._parse_llm_analysis(completion.choices[0].message.content)
+        
+        except Exception as e:
+            logger.error(f"LLM hallucination detection failed: {e}")
+            return []
+    
+    async def _adetect_llm_issues(self, response: str, context: str) -> List[str]:
+        """Detect issues using LLM analysis asynchronously."""
+        try:
+            completion = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": self._llm_prompt(response, context)}],
+                temperature=0.1,
+                max_tokens=200
+            )
+            
+            return self._parse_llm_analysis(completion.choices[0].message.content)
+        
+        except Exception as e:
+            logger.error(f"LLM hallucination detection failed: {e}")
+            return []
+    
+    @staticmethod
+    def _llm_prompt(response: str, context: str) -> str:
+        """Build the LLM analysis prompt."""
+        return f"""
             Analyze the following AI response for potential hallucinations or inaccuracies.
             
             Context: {context}
@@ -134,26 +182,16 @@ class HallucinationDetector:
             
             Provide a brief analysis of any issues found.
             """
-            
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=200
-            )
-            
-            analysis = completion.choices[0].message.content.strip()
-            
-            # Parse the analysis for issues
-            issues = []
-            if "issue" in analysis.lower() or "problem" in analysis.lower():
-                issues.append(f"LLM detected issues: {analysis}")
-            
-            return issues
+    
+    @staticmethod
+    def _parse_llm_analysis(analysis: str) -> List[str]:
+        """Parse the LLM analysis for issues."""
+        analysis = analysis.strip()
+        issues = []
+        if "issue" in analysis.lower() or "problem" in analysis.lower():
+            issues.append(f"LLM detected issues: {analysis}")
         
-        except Exception as e:
-            logger.error(f"LLM hallucination detection failed: {e}")
-            return []
+        return issues
     
     def _calculate_confidence(self, response: str, issues: List[str]) -> float:
         """Calculate confidence in the response."""
@@ -198,14 +236,89 @@ class HallucinationDetector:
         
         return suggestions
     
-    def batch_detect(self, responses: List[str], contexts: List[str] = None) -> List[HallucinationResult]:
-        """Detect hallucinations in multiple responses."""
-        results = []
+    def batch_detect(
+        self,
+        responses: List[str],
+        contexts: List[str] = None,
+        deep_scan: bool = False
+    ) -> List[HallucinationResult]:
+        """Detect hallucinations in multiple responses, running up to max_concurrency LLM checks at once."""
+        pattern_issues, suspect_indices = self._pattern_stage(responses, contexts, deep_scan)
         
+        # Threads over the sync client rather than asyncio.run: the async client's pool is bound
+        # to the loop it first ran on, and this may be called while a loop is already running
+        llm_results = []
+        if suspect_indices:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(suspect_indices))) as pool:
+                futures = [
+                    pool.submit(self._detect_llm_issues, responses[i], contexts[i])
+                    for i in suspect_indices
+                ]
+                llm_results = [future.exception() or future.result() for future in futures]
+        
+        return self._combine_stages(responses, pattern_issues, dict(zip(suspect_indices, llm_results)))
+    
+    async def abatch_detect(
+        self,
+        responses: List[str],
+        contexts: List[str] = None,
+        deep_scan: bool = False
+    ) -> List[HallucinationResult]:
+        """Detect hallucinations in multiple responses, running up to max_concurrency LLM checks at once."""
+        pattern_issues, suspect_indices = self._pattern_stage(responses, contexts, deep_scan)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded(i: int) -> List[str]:
+            async with semaphore:
+                return await self._adetect_llm_issues(responses[i], contexts[i])
+        
+        llm_results = await asyncio.gather(
+            *(bounded(i) for i in suspect_indices),
+            return_exceptions=True
+        )
+        
+        return self._combine_stages(responses, pattern_issues, dict(zip(suspect_indices, llm_results)))
+    
+    def _pattern_stage(
+        self,
+        responses: List[str],
+        contexts: Optional[List[str]],
+        deep_scan: bool
+    ) -> Tuple[List[Any], List[int]]:
+        """Pattern-scan every response and pick the indices that also need an LLM check."""
+        pattern_issues = []
+        for response in responses:
+            try:
+                pattern_issues.append(self._detect_pattern_issues(response))
+            except Exception as e:
+                pattern_issues.append(e)
+        
+        # Only responses with a context and a suspicious pattern (or all, on a deep scan)
+        # go to the LLM
+        suspect_indices = [
+            i for i, issues in enumerate(pattern_issues)
+            if (issues or deep_scan) and not isinstance(issues, Exception)
+            and contexts and i < len(contexts) and contexts[i]
+        ]
+        return pattern_issues, suspect_indices
+    
+    def _combine_stages(
+        self,
+        responses: List[str],
+        pattern_issues: List[Any],
+        llm_issues: Dict[int, Any]
+    ) -> List[HallucinationResult]:
+        """Build per-response results from pattern issues and any LLM issues or errors."""
+        results = []
         for i, response in enumerate(responses):
-            context = contexts[i] if contexts and i < len(contexts) else None
-            result = self.detect_hallucination(response, context)
-            results.append(result)
+            issues = pattern_issues[i]
+            extra = llm_issues.get(i, [])
+            if isinstance(issues, Exception) or isinstance(extra, Exception):
+                error = issues if isinstance(issues, Exception) else extra
+                logger.error(f"Hallucination detection failed: {error}")
+                results.append(self._failed_result(error))
+            else:
+                results.append(self._build_result(response, issues + extra))
         
         return results
     
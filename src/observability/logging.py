@@ -2,16 +2,117 @@
 Structured logging configuration with correlation IDs.
 """
 
+import atexit
+import orjson
+import os
+import queue
 import structlog
 import logging
 import sys
-from typing import Any, Dict, Optional
-import uuid
+import threading
+from itertools import islice
+from typing import Any, Dict, List, Optional
 from contextvars import ContextVar
 
 # Context variable for correlation ID
 correlation_id: ContextVar[Optional[str]] = ContextVar('correlation_id', default=None)
 
+logger = structlog.get_logger(__name__)
+
+_stack_info_renderer = structlog.processors.StackInfoRenderer()
+
+# Execution start events list at most this many input keys
+_MAX_LOGGED_INPUT_KEYS = 8
+
+# ASGI header names are lowercase bytes
+_CORRELATION_ID_HEADER = b"x-correlation-id"
+
+# Background writer that owns stdout once setup_logging has run
+_sink: Optional["_LogSink"] = None
+
+
+class _LogSink:
+    """Writes serialized log lines to a binary stream from a background thread."""
+    
+    # Most lines written per syscall; bounds both latency and the iovec count
+    max_batch = 64
+    
+    def __init__(self, stream):
+        self._stream = stream
+        # Batches go straight to the file descriptor with writev where possible
+        try:
+            stream.flush()
+            self._fd = stream.fileno() if hasattr(os, "writev") else None
+        except (AttributeError, OSError, ValueError):
+            self._fd = None
+        self._queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+    
+    def write(self, data: bytes):
+        """Queue data for the writer thread; callers never block on I/O."""
+        self._queue.put(data)
+    
+    def flush(self):
+        """No-op; the writer thread flushes after writing."""
+    
+    def close(self):
+        """Write everything queued so far, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        while True:
+            # Block for one line, then take whatever else is already queued
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except (OSError, ValueError):
+                    # A closed or broken stdout must not take the writer thread down
+                    pass
+            
+            if stop:
+                return
+    
+    def _write_batch(self, batch: List[bytes]):
+        """Write a batch of lines with as few syscalls as possible."""
+        if self._fd is None:
+            self._stream.write(b"".join(batch))
+            self._stream.flush()
+            return
+        
+        written = os.writev(self._fd, batch)
+        if written < sum(map(len, batch)):
+            # Finish a partial write with plain writes
+            remaining = memoryview(b"".join(batch))[written:]
+            while remaining:
+                remaining = remaining[os.write(self._fd, remaining):]
+
+
+class _SinkHandler(logging.Handler):
+    """Stdlib handler that formats records and hands them to the log sink."""
+    
+    def __init__(self, sink: _LogSink):
+        super().__init__()
+        self.sink = sink
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.sink.write((self.format(record) + "\n").encode("utf-8"))
+        except Exception:
+            self.handleError(record)
+
 
 def get_correlation_id() -> Optional[str]:
     """Get the current correlation ID."""
@@ -24,57 +125,94 @@ def set_correlation_id(corr_id: str):
 
 
 def generate_correlation_id() -> str:
-    """Generate a new correlation ID."""
-    return str(uuid.uuid4())
+    """Generate a new correlation ID: 128 random bits as 32 hex characters."""
+    return os.urandom(16).hex()
 
 
 def setup_logging(log_level: str = "INFO", log_format: str = "json"):
     """Setup structured logging."""
-    # Configure structlog
-    processors = [
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-    ]
-    
-    # Add correlation ID processor
-    processors.append(add_correlation_id)
-    
-    # Choose output format
+    global _sink
+    level = getattr(logging, log_level.upper())
+    
+    # Log calls only enqueue; a background thread does the stdout writes. The sink is
+    # kept across calls since cached loggers hold on to it
+    if _sink is None:
+        _sink = _LogSink(sys.stdout.buffer)
+        atexit.register(shutdown_logging)
+    
     if log_format == "json":
-        processors.append(structlog.processors.JSONRenderer())
+        # Events are encoded straight to UTF-8 bytes and written to stdout's buffer;
+        # levels below log_level are dropped before any processor runs
+        structlog.configure(
+            processors=[
+                structlog.processors.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso"),
+                render_exception_details,
+                structlog.processors.UnicodeDecoder(),
+                add_correlation_id,
+                structlog.processors.JSONRenderer(serializer=orjson.dumps),
+            ],
+            context_class=dict,
+            logger_factory=structlog.BytesLoggerFactory(_sink),
+            wrapper_class=structlog.make_filtering_bound_logger(level),
+            cache_logger_on_first_use=True,
+        )
     else:
+        # Configure structlog
+        processors = [
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            render_exception_details,
+            structlog.processors.UnicodeDecoder(),
+        ]
+        
+        # Add correlation ID processor
+        processors.append(add_correlation_id)
         processors.append(structlog.dev.ConsoleRenderer())
-    
-    structlog.configure(
-        processors=processors,
-        context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        cache_logger_on_first_use=True,
-    )
+        
+        structlog.configure(
+            processors=processors,
+            context_class=dict,
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            cache_logger_on_first_use=True,
+        )
     
     # Configure standard library logging
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, log_level.upper()),
-    )
+    handler = _SinkHandler(_sink)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [handler]
+    root_logger.setLevel(level)
     
     # Set log levels for noisy libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
     
-    logger = structlog.get_logger(__name__)
     logger.info("Structured logging configured", log_level=log_level, format=log_format)
 
 
+def shutdown_logging():
+    """Flush queued log lines and stop the background writer."""
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+
+
+def render_exception_details(logger, method_name, event_dict):
+    """Render stack and exception info only for events that carry them."""
+    if "stack_info" in event_dict:
+        event_dict = _stack_info_renderer(logger, method_name, event_dict)
+    if "exc_info" in event_dict:
+        event_dict = structlog.processors.format_exc_info(logger, method_name, event_dict)
+    return event_dict
+
+
 def add_correlation_id(logger, method_name, event_dict):
     """Add correlation ID to log events."""
     corr_id = get_correlation_id()
@@ -100,28 +238,33 @@ class LoggingMiddleware:
             corr_id = generate_correlation_id()
             set_correlation_id(corr_id)
             
-            # Add to request headers
-            headers = dict(scope.get("headers", []))
-            headers[b"x-correlation-id"] = corr_id.encode()
-            scope["headers"] = [(k, v) for k, v in headers.items()]
+            # Add to request headers, replacing any correlation ID the client sent
+            headers = list(scope.get("headers", []))
+            corr_id_header = (_CORRELATION_ID_HEADER, corr_id.encode())
+            for i, (name, _) in enumerate(headers):
+                if name == _CORRELATION_ID_HEADER:
+                    headers[i] = corr_id_header
+                    break
+            else:
+                headers.append(corr_id_header)
+            scope["headers"] = headers
         
         await self.app(scope, receive, send)
 
 
 def log_execution_start(execution_id: str, workflow_id: str, input_data: Dict[str, Any]):
     """Log the start of an execution."""
-    logger = get_logger(__name__)
     logger.info(
         "Execution started",
         execution_id=execution_id,
         workflow_id=workflow_id,
-        input_keys=list(input_data.keys())
+        input_keys=tuple(islice(input_data, _MAX_LOGGED_INPUT_KEYS)),
+        input_key_count=len(input_data)
     )
 
 
 def log_execution_end(execution_id: str, status: str, duration_ms: int, token_usage: Dict[str, int]):
     """Log the end of an execution."""
-    logger = get_logger(__name__)
     logger.info(
         "Execution completed",
         execution_id=execution_id,
@@ -133,7 +276,6 @@ def log_execution_end(execution_id: str, status: str, duration_ms: int, token_us
 
 def log_execution_error(execution_id: str, error: str, duration_ms: int):
     """Log an execution error."""
-    logger = get_logger(__name__)
     logger.error(
         "Execution failed",
         execution_id=execution_id,
@@ -144,7 +286,6 @@ def log_execution_error(execution_id: str, error: str, duration_ms: int):
 
 def log_llm_call(model: str, operation: str, tokens: int, cost: float):
     """Log an LLM call."""
-    logger = get_logger(__name__)
     logger.info(
         "LLM call",
         model=model,
@@ -156,7 +297,6 @@ def log_llm_call(model: str, operation: str, tokens: int, cost: float):
 
 def log_vector_operation(operation: str, store_type: str, duration_ms: int, result_count: int):
     """Log a vector operation."""
-    logger = get_logger(__name__)
     logger.info(
         "Vector operation",
         operation=operation,
@@ -168,7 +308,6 @@ def log_vector_operation(operation: str, store_type: str, duration_ms: int, resu
 
 def log_tool_execution(tool_name: str, status: str, duration_ms: int):
     """Log a tool execution."""
-    logger = get_logger(__name__)
     logger.info(
         "Tool execution",
         tool_name=tool_name,
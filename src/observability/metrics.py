@@ -2,20 +2,157 @@
 Prometheus metrics collection and export.
 """
 
-from prometheus_client import Counter, Histogram, Gauge, Info, CollectorRegistry, generate_latest
-from typing import Dict, Any, Optional
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+import threading
 import time
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Label value that out-of-bounds values are folded into
+OTHER_LABEL = "other"
 
-class MetricsCollector:
-    """Collects and exports Prometheus metrics."""
+# Metric type -> suffix of the sample that get_metrics_dict sums
+_SUMMARY_SAMPLE_SUFFIX = {"counter": "_total", "histogram": "_count", "gauge": ""}
+
+
+class _BoundedLabel:
+    """Caps a label's distinct values; values outside the allowlist (or past max_values) become "other"."""
+    
+    __slots__ = ("allowed", "max_values", "seen")
+    
+    def __init__(self, allowed: Optional[Iterable[str]] = None, max_values: int = 100):
+        self.allowed = frozenset(allowed) if allowed is not None else None
+        self.max_values = max_values
+        self.seen: Set[str] = set()
+    
+    def __call__(self, value: str) -> str:
+        if self.allowed is not None:
+            return value if value in self.allowed else OTHER_LABEL
+        
+        # Without an allowlist, admit the first max_values distinct values
+        if value in self.seen:
+            return value
+        if len(self.seen) < self.max_values:
+            self.seen.add(value)
+            return value
+        return OTHER_LABEL
+
+
+class _LabelledChildren:
+    """Memoizes a labelled metric's children by label values, skipping labels() on repeat calls."""
+    
+    __slots__ = ("metric", "children")
+    
+    def __init__(self, metric):
+        self.metric = metric
+        self.children: Dict[Tuple[str, ...], Any] = {}
+    
+    def __call__(self, *label_values: str):
+        child = self.children.get(label_values)
+        if child is None:
+            child = self.children[label_values] = self.metric.labels(*label_values)
+        return child
+
+
+class _ThreadLocalCounts:
+    """Per-thread counter increments, merged into the Prometheus counters by flush().
+    
+    Each thread adds into its own dict of running totals with no lock at all. flush() copies
+    each dict (atomic under the GIL) and applies what grew since the previous flush, so adds
+    never wait on the flusher and an add racing a flush is picked up by the next one.
+    """
     
     def __init__(self):
+        self._local = threading.local()
+        # (owning thread, its running totals, the totals already applied to the counters)
+        self._shards: List[Tuple[threading.Thread, Dict[Any, float], Dict[Any, float]]] = []
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+    
+    def add(self, child, amount: float = 1):
+        """Count amount against a counter child."""
+        counts = getattr(self._local, "counts", None)
+        if counts is None:
+            counts = self._local.counts = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), counts, {}))
+        
+        counts[child] = counts.get(child, 0) + amount
+    
+    def flush(self):
+        """Apply every pending increment to its counter."""
+        with self._flush_lock:
+            with self._shards_lock:
+                shards = list(self._shards)
+            
+            for shard in shards:
+                thread, counts, applied = shard
+                # Checked before the copy, so a finished thread's last adds are in it
+                alive = thread.is_alive()
+                for child, total in counts.copy().items():
+                    delta = total - applied.get(child, 0)
+                    if delta:
+                        child.inc(delta)
+                        applied[child] = total
+                
+                if not alive:
+                    with self._shards_lock:
+                        self._shards.remove(shard)
+
+
+class MetricsCollector:
+    """Collects and exports Prometheus metrics.
+    
+    Every label value becomes its own time series, so labels must come from bounded sets:
+    pass route templates (e.g. "/workflows/{workflow_id}") as endpoints, never raw paths,
+    and never use per-request IDs as labels. Endpoint, model, tool and workflow labels are
+    additionally capped to an allowlist, or to the first max_label_values values seen.
+    """
+    
+    def __init__(
+        self,
+        max_label_values: int = 100,
+        allowed_endpoints: Optional[Iterable[str]] = None,
+        allowed_models: Optional[Iterable[str]] = None,
+        allowed_tools: Optional[Iterable[str]] = None,
+        allowed_workflows: Optional[Iterable[str]] = None,
+        flush_interval: float = 1.0,
+        scrape_cache_ttl: float = 0.25
+    ):
         self.registry = CollectorRegistry()
+        self.max_label_values = max_label_values
+        self._endpoint_label = _BoundedLabel(allowed_endpoints, max_label_values)
+        self._model_label = _BoundedLabel(allowed_models, max_label_values)
+        self._tool_label = _BoundedLabel(allowed_tools, max_label_values)
+        self._workflow_label = _BoundedLabel(allowed_workflows, max_label_values)
         self._setup_metrics()
+        
+        # Last serialized scrape as (monotonic time, output)
+        self.scrape_cache_ttl = scrape_cache_ttl
+        self._scrape_cache: Tuple[float, bytes] = (float("-inf"), b"")
+        self._scrape_lock = threading.Lock()
+        
+        # The hottest counters accumulate per thread; a daemon thread merges them every
+        # flush_interval seconds, and every scrape flushes first
+        self._pending = _ThreadLocalCounts()
+        self._flush_interval = flush_interval
+        self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+    
+    def _flush_loop(self):
+        """Periodically merge per-thread counter increments into the registry."""
+        while True:
+            time.sleep(self._flush_interval)
+            try:
+                self._pending.flush()
+            except Exception as e:
+                logger.error("Failed to flush metrics", error=str(e))
+    
+    def set_allowed_workflows(self, workflow_ids: Iterable[str]):
+        """Restrict workflow_id labels to the given workflows, e.g. the configured ones at startup."""
+        self._workflow_label = _BoundedLabel(workflow_ids, self.max_label_values)
     
     def _setup_metrics(self):
         """Setup Prometheus metrics."""
@@ -114,43 +251,58 @@ class MetricsCollector:
             registry=self.registry
         )
         
-        # Info metric
-        self.service_info = Info(
-            'genai_service_info',
-            'Service information',
+        # Label children are looked up once per label combination, in label declaration order
+        self._request_count = _LabelledChildren(self.request_count)
+        self._request_duration = _LabelledChildren(self.request_duration)
+        self._llm_requests = _LabelledChildren(self.llm_requests)
+        self._llm_tokens = _LabelledChildren(self.llm_tokens)
+        self._llm_cost = _LabelledChildren(self.llm_cost)
+        self._vector_operations = _LabelledChildren(self.vector_operations)
+        self._vector_search_duration = _LabelledChildren(self.vector_search_duration)
+        self._tool_executions = _LabelledChildren(self.tool_executions)
+        self._tool_duration = _LabelledChildren(self.tool_duration)
+        self._workflow_executions = _LabelledChildren(self.workflow_executions)
+        self._workflow_duration = _LabelledChildren(self.workflow_duration)
+        
+        # Build info as a constant 1-valued gauge, set once
+        self.service_info = Gauge(
+            'genai_service_build_info',
+            'Service build information',
+            ['version', 'service'],
             registry=self.registry
         )
-        self.service_info.info({
-            'version': '1.0.0',
-            'service': 'enterprise-genai-platform'
-        })
+        self.service_info.labels('1.0.0', 'enterprise-genai-platform').set(1)
     
     def record_request(self, method: str, endpoint: str, status: str, duration: float):
         """Record a request metric."""
-        self.request_count.labels(method=method, endpoint=endpoint, status=status).inc()
-        self.request_duration.labels(method=method, endpoint=endpoint).observe(duration)
+        endpoint = self._endpoint_label(endpoint)
+        self._pending.add(self._request_count(method, endpoint, status))
+        self._request_duration(method, endpoint).observe(duration)
     
     def record_llm_request(self, model: str, operation: str, tokens: int, cost: float):
         """Record LLM metrics."""
-        self.llm_requests.labels(model=model, operation=operation).inc()
-        self.llm_tokens.labels(model=model, type='total').inc(tokens)
-        self.llm_cost.labels(model=model).inc(cost)
+        model = self._model_label(model)
+        self._pending.add(self._llm_requests(model, operation))
+        self._pending.add(self._llm_tokens(model, 'total'), tokens)
+        self._pending.add(self._llm_cost(model), cost)
     
     def record_vector_operation(self, operation: str, store_type: str, duration: float):
         """Record vector operation metrics."""
-        self.vector_operations.labels(operation=operation, store_type=store_type).inc()
+        self._vector_operations(operation, store_type).inc()
         if operation == 'search':
-            self.vector_search_duration.labels(store_type=store_type).observe(duration)
+            self._vector_search_duration(store_type).observe(duration)
     
     def record_tool_execution(self, tool_name: str, status: str, duration: float):
         """Record tool execution metrics."""
-        self.tool_executions.labels(tool_name=tool_name, status=status).inc()
-        self.tool_duration.labels(tool_name=tool_name).observe(duration)
+        tool_name = self._tool_label(tool_name)
+        self._tool_executions(tool_name, status).inc()
+        self._tool_duration(tool_name).observe(duration)
     
     def record_workflow_execution(self, workflow_id: str, status: str, duration: float):
         """Record workflow execution metrics."""
-        self.workflow_executions.labels(workflow_id=workflow_id, status=status).inc()
-        self.workflow_duration.labels(workflow_id=workflow_id).observe(duration)
+        workflow_id = self._workflow_label(workflow_id)
+        self._workflow_executions(workflow_id, status).inc()
+        self._workflow_duration(workflow_id).observe(duration)
     
     def set_active_executions(self, count: int):
         """Set the number of active executions."""
@@ -160,21 +312,32 @@ class MetricsCollector:
         """Set memory usage."""
         self.memory_usage.set(bytes_used)
     
-    def get_metrics(self) -> str:
-        """Get metrics in Prometheus format."""
-        return generate_latest(self.registry).decode('utf-8')
-    
-    def get_metrics_dict(self) -> Dict[str, Any]:
-        """Get metrics as a dictionary."""
-        # This is a simplified version - in practice, you'd parse the Prometheus format
-        return {
-            'request_count': 'See /metrics endpoint for detailed metrics',
-            'llm_metrics': 'See /metrics endpoint for detailed metrics',
-            'vector_metrics': 'See /metrics endpoint for detailed metrics',
-            'tool_metrics': 'See /metrics endpoint for detailed metrics',
-            'workflow_metrics': 'See /metrics endpoint for detailed metrics'
-        }
-
+    def get_metrics(self) -> bytes:
+        """Get metrics in Prometheus text format, serialized at most once per scrape_cache_ttl."""
+        # Served as bytes with prometheus_client.CONTENT_TYPE_LATEST; concurrent scrapers share one output
+        with self._scrape_lock:
+            generated_at, output = self._scrape_cache
+            now = time.monotonic()
+            if now - generated_at >= self.scrape_cache_ttl:
+                self._pending.flush()
+                output = generate_latest(self.registry)
+                self._scrape_cache = (now, output)
+            return output
+    
+    def get_metrics_dict(self) -> Dict[str, float]:
+        """Get a summary of each metric summed over its labels; /metrics remains the source of truth."""
+        self._pending.flush()
+        summary = {}
+        for metric in self.registry.collect():
+            # Counters report their total, histograms their observation count, gauges their value
+            suffix = _SUMMARY_SAMPLE_SUFFIX.get(metric.type)
+            if suffix is None:
+                continue
+            sample_name = metric.name + suffix
+            summary[metric.name] = sum(
+                sample.value for sample in metric.samples if sample.name == sample_name
+            )
+        return summary
 
 # Global metrics collector
 metrics_collector = MetricsCollector()
@@ -4,9 +4,11 @@ OpenTelemetry tracing configuration and instrumentation.
 
 import os
 from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.psycopg2 import Psycopg2Instrumentor
@@ -15,6 +17,9 @@ import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Status is immutable, so the description-less OK status is shared
+_OK = Status(StatusCode.OK)
+
 
 def setup_tracing(service_name: str = "enterprise-genai-platform"):
     """Setup OpenTelemetry tracing."""
@@ -26,24 +31,38 @@ def setup_tracing(service_name: str = "enterprise-genai-platform"):
             "deployment.environment": os.getenv("ENVIRONMENT", "development")
         })
         
-        # Create tracer provider
-        tracer_provider = TracerProvider(resource=resource)
+        # Create tracer provider; only a sampled fraction of root traces is recorded,
+        # and child spans follow their parent's decision
+        sample_ratio = float(os.getenv("OTEL_SAMPLE_RATIO", "0.05"))
+        tracer_provider = TracerProvider(
+            resource=resource,
+            sampler=ParentBasedTraceIdRatio(sample_ratio)
+        )
         trace.set_tracer_provider(tracer_provider)
         
         # Create OTLP exporter
         otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
         otlp_exporter = OTLPSpanExporter(endpoint=otlp_endpoint)
         
-        # Create span processor
-        span_processor = BatchSpanProcessor(otlp_exporter)
+        # Create span processor; larger batches amortize each export
+        span_processor = BatchSpanProcessor(
+            otlp_exporter,
+            max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "8192")),
+            max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "1024")),
+            schedule_delay_millis=int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000"))
+        )
         tracer_provider.add_span_processor(span_processor)
         
-        # Instrument libraries
-        FastAPIInstrumentor.instrument()
-        Psycopg2Instrumentor().instrument()
-        OpenAIInstrumentor().instrument()
+        # Instrument libraries; per-query and per-LLM-call spans are opt-in since they
+        # sit on the hot path
+        if os.getenv("OTEL_INSTRUMENT_FASTAPI", "1") == "1":
+            FastAPIInstrumentor.instrument()
+        if os.getenv("OTEL_INSTRUMENT_PSYCOPG2") == "1":
+            Psycopg2Instrumentor().instrument()
+        if os.getenv("OTEL_INSTRUMENT_OPENAI") == "1":
+            OpenAIInstrumentor().instrument()
         
-        logger.info(f"OpenTelemetry tracing configured for {service_name}")
+        logger.info(f"OpenTelemetry tracing configured for {service_name} (sample ratio {sample_ratio})")
         return tracer_provider
     
     except Exception as e:
@@ -58,10 +77,8 @@ def get_tracer(name: str):
 
 def create_span(tracer, name: str, **attributes):
     """Create a new span."""
-    span = tracer.start_span(name)
-    for key, value in attributes.items():
-        span.set_attribute(key, value)
-    return span
+    # Attributes set at construction are stored in one pass instead of per-key calls
+    return tracer.start_span(name, attributes=attributes)
 
 
 def add_span_event(span, name: str, **attributes):
@@ -71,10 +88,8 @@ def add_span_event(span, name: str, **attributes):
 
 def set_span_status(span, status_code: str, description: str = None):
     """Set the status of a span."""
-    from opentelemetry.trace import Status, StatusCode
-    
     if status_code == "OK":
-        span.set_status(Status(StatusCode.OK))
+        span.set_status(_OK)
     elif status_code == "ERROR":
         span.set_status(Status(StatusCode.ERROR, description))
     else:
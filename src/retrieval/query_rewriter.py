@@ -3,14 +3,84 @@ Query rewriting for improved retrieval precision.
 Implements various query expansion and rewriting strategies.
 """
 
+import asyncio
+import functools
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+import httpx
 import structlog
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 logger = structlog.get_logger(__name__)
 
+# Basic keyword expansion rules for the rule-based fallback, keyed by uppercase keyword
+_SIMPLE_EXPANSIONS: Dict[str, str] = {
+    'ML': 'machine learning ML',
+    'AI': 'artificial intelligence AI',
+    'API': 'application programming interface API',
+    'SQL': 'structured query language SQL',
+    'DB': 'database DB',
+    'UI': 'user interface UI',
+    'UX': 'user experience UX'
+}
+
+# All keywords in one alternation, so the query is scanned once
+_SIMPLE_EXPANSION_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, _SIMPLE_EXPANSIONS)) + r')\b', re.IGNORECASE
+)
+
+# LLM prompt templates; only {query} is substituted per call
+_EXPAND_PROMPT = """
+            Expand the following query with related terms, synonyms, and concepts to improve search results.
+            Focus on adding relevant technical terms, alternative phrasings, and related concepts.
+            
+            Original query: {query}
+            
+            Provide an expanded query that maintains the original intent while adding relevant terms.
+            """
+
+_REFORMULATE_PROMPT = """
+            Reformulate the following query to be more specific and clear for document search.
+            Make it more precise while maintaining the original intent.
+            
+            Original query: {query}
+            
+            Provide a reformulated query that is more specific and likely to find relevant documents.
+            """
+
+_SYNONYM_PROMPT = """
+            Expand the following query with synonyms and alternative terms.
+            Keep the original query intact but add synonyms in parentheses.
+            
+            Original query: {query}
+            
+            Example format: "machine learning (ML, artificial intelligence, AI, deep learning)"
+            """
+
+_PARAPHRASE_PROMPT = """
+            Paraphrase the following query in a different way while maintaining the exact same meaning.
+            
+            Original query: {query}
+            
+            Provide a paraphrased version that expresses the same intent using different words.
+            """
+
+
+@functools.lru_cache(maxsize=8)
+def _shared_client(api_key: str) -> OpenAI:
+    """Get the sync OpenAI client, and its keep-alive HTTP/2 pool, shared by every rewriter using api_key."""
+    return OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+    )
+
 
 @dataclass
 class QueryRewriteResult:
@@ -22,12 +92,53 @@ class QueryRewriteResult:
     metadata: Dict[str, Any]
 
 
+@dataclass(frozen=True)
+class _RewriteSpec:
+    """LLM prompt, call settings and result metadata for one rewrite strategy."""
+    prompt: str
+    temperature: float
+    max_tokens: int
+    confidence: float
+    method: str
+    error_message: str
+
+
 class QueryRewriter:
     """Handles query rewriting and expansion for better retrieval."""
     
-    def __init__(self, openai_api_key: str, model: str = "gpt-3.5-turbo"):
-        self.client = OpenAI(api_key=openai_api_key)
+    def __init__(
+        self,
+        openai_api_key: str,
+        model: str = "gpt-3.5-turbo",
+        cache_size: int = 1024,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        # Sync calls share one pool per API key; async calls use the caller's pool (e.g. the
+        # API worker's), since an async pool is tied to the event loop it was opened on
+        self.client = _shared_client(openai_api_key)
+        self.aclient = AsyncOpenAI(api_key=openai_api_key, http_client=http_client)
         self.model = model
+        
+        # Successful LLM rewrites keyed by (query, rewrite_type), LRU-evicted
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], QueryRewriteResult]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    # Per-strategy LLM call settings and result metadata
+    _LLM_REWRITES: Dict[str, _RewriteSpec] = {
+        "expansion": _RewriteSpec(
+            _EXPAND_PROMPT, 0.3, 200, 0.8, "llm_expansion", "Failed to expand query"
+        ),
+        "reformulation": _RewriteSpec(
+            _REFORMULATE_PROMPT, 0.2, 150, 0.9, "llm_reformulation", "Failed to reformulate query"
+        ),
+        "synonym": _RewriteSpec(
+            _SYNONYM_PROMPT, 0.1, 150, 0.7, "llm_synonym", "Failed to expand synonyms"
+        ),
+        "paraphrase": _RewriteSpec(
+            _PARAPHRASE_PROMPT, 0.4, 100, 0.8, "llm_paraphrase", "Failed to paraphrase query"
+        )
+    }
     
     def rewrite_query(self, query: str, rewrite_type: str = "expansion") -> QueryRewriteResult:
         """Rewrite a query using the specified strategy."""
@@ -42,172 +153,110 @@ class QueryRewriter:
         else:
             raise ValueError(f"Unknown rewrite type: {rewrite_type}")
     
-    def _expand_query(self, query: str) -> QueryRewriteResult:
-        """Expand query with related terms and concepts."""
+    async def arewrite_query(self, query: str, rewrite_type: str = "expansion") -> QueryRewriteResult:
+        """Rewrite a query using the specified strategy asynchronously."""
+        if rewrite_type not in self._LLM_REWRITES:
+            raise ValueError(f"Unknown rewrite type: {rewrite_type}")
+        
+        cached = self._cached_rewrite(query, rewrite_type)
+        if cached is not None:
+            return cached
+        
         try:
-            prompt = f"""
-            Expand the following query with related terms, synonyms, and concepts to improve search results.
-            Focus on adding relevant technical terms, alternative phrasings, and related concepts.
-            
-            Original query: {query}
-            
-            Provide an expanded query that maintains the original intent while adding relevant terms.
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=200
-            )
-            
-            rewritten_query = response.choices[0].message.content.strip()
-            
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=rewritten_query,
-                rewrite_type="expansion",
-                confidence=0.8,
-                metadata={"method": "llm_expansion"}
+            response = await self.aclient.chat.completions.create(
+                **self._rewrite_request(query, rewrite_type)
             )
-        
+            return self._rewrite_result(query, rewrite_type, response)
         except Exception as e:
-            logger.error(f"Failed to expand query: {e}")
-            # Fallback to simple expansion
-            return self._simple_expansion(query)
+            return self._rewrite_failed(query, rewrite_type, e)
+    
+    def _expand_query(self, query: str) -> QueryRewriteResult:
+        """Expand query with related terms and concepts."""
+        return self._llm_rewrite(query, "expansion")
     
     def _reformulate_query(self, query: str) -> QueryRewriteResult:
         """Reformulate query for better clarity and specificity."""
-        try:
-            prompt = f"""
-            Reformulate the following query to be more specific and clear for document search.
-            Make it more precise while maintaining the original intent.
-            
-            Original query: {query}
-            
-            Provide a reformulated query that is more specific and likely to find relevant documents.
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=150
-            )
-            
-            rewritten_query = response.choices[0].message.content.strip()
-            
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=rewritten_query,
-                rewrite_type="reformulation",
-                confidence=0.9,
-                metadata={"method": "llm_reformulation"}
-            )
-        
-        except Exception as e:
-            logger.error(f"Failed to reformulate query: {e}")
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=query,
-                rewrite_type="reformulation",
-                confidence=0.1,
-                metadata={"error": str(e)}
-            )
+        return self._llm_rewrite(query, "reformulation")
     
     def _synonym_expansion(self, query: str) -> QueryRewriteResult:
         """Expand query with synonyms."""
-        try:
-            prompt = f"""
-            Expand the following query with synonyms and alternative terms.
-            Keep the original query intact but add synonyms in parentheses.
-            
-            Original query: {query}
-            
-            Example format: "machine learning (ML, artificial intelligence, AI, deep learning)"
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=150
-            )
-            
-            rewritten_query = response.choices[0].message.content.strip()
-            
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=rewritten_query,
-                rewrite_type="synonym",
-                confidence=0.7,
-                metadata={"method": "llm_synonym"}
-            )
-        
-        except Exception as e:
-            logger.error(f"Failed to expand synonyms: {e}")
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=query,
-                rewrite_type="synonym",
-                confidence=0.1,
-                metadata={"error": str(e)}
-            )
+        return self._llm_rewrite(query, "synonym")
     
     def _paraphrase_query(self, query: str) -> QueryRewriteResult:
         """Paraphrase the query while maintaining meaning."""
-        try:
-            prompt = f"""
-            Paraphrase the following query in a different way while maintaining the exact same meaning.
-            
-            Original query: {query}
-            
-            Provide a paraphrased version that expresses the same intent using different words.
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4,
-                max_tokens=100
-            )
-            
-            rewritten_query = response.choices[0].message.content.strip()
-            
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=rewritten_query,
-                rewrite_type="paraphrase",
-                confidence=0.8,
-                metadata={"method": "llm_paraphrase"}
-            )
+        return self._llm_rewrite(query, "paraphrase")
+    
+    def _llm_rewrite(self, query: str, rewrite_type: str) -> QueryRewriteResult:
+        """Rewrite a query with the LLM using the given strategy."""
+        cached = self._cached_rewrite(query, rewrite_type)
+        if cached is not None:
+            return cached
         
+        try:
+            response = self.client.chat.completions.create(**self._rewrite_request(query, rewrite_type))
+            return self._rewrite_result(query, rewrite_type, response)
         except Exception as e:
-            logger.error(f"Failed to paraphrase query: {e}")
-            return QueryRewriteResult(
-                original_query=query,
-                rewritten_query=query,
-                rewrite_type="paraphrase",
-                confidence=0.1,
-                metadata={"error": str(e)}
-            )
+            return self._rewrite_failed(query, rewrite_type, e)
     
-    def _simple_expansion(self, query: str) -> QueryRewriteResult:
-        """Simple rule-based query expansion as fallback."""
-        # Basic keyword expansion rules
-        expansions = {
-            r'\bML\b': 'machine learning ML',
-            r'\bAI\b': 'artificial intelligence AI',
-            r'\bAPI\b': 'application programming interface API',
-            r'\bSQL\b': 'structured query language SQL',
-            r'\bDB\b': 'database DB',
-            r'\bUI\b': 'user interface UI',
-            r'\bUX\b': 'user experience UX'
+    def _rewrite_request(self, query: str, rewrite_type: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for a rewrite strategy."""
+        spec = self._LLM_REWRITES[rewrite_type]
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": spec.prompt.format(query=query)}],
+            "temperature": spec.temperature,
+            "max_tokens": spec.max_tokens
         }
+    
+    def _rewrite_result(self, query: str, rewrite_type: str, response: Any) -> QueryRewriteResult:
+        """Build and cache the result of a successful LLM rewrite."""
+        spec = self._LLM_REWRITES[rewrite_type]
+        result = QueryRewriteResult(
+            original_query=query,
+            rewritten_query=response.choices[0].message.content.strip(),
+            rewrite_type=rewrite_type,
+            confidence=spec.confidence,
+            metadata={"method": spec.method}
+        )
+        
+        key = (query, rewrite_type)
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        return result
+    
+    def _cached_rewrite(self, query: str, rewrite_type: str) -> Optional[QueryRewriteResult]:
+        """Get a cached LLM rewrite; failed rewrites are never cached."""
+        key = (query, rewrite_type)
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+    
+    def _rewrite_failed(self, query: str, rewrite_type: str, error: Exception) -> QueryRewriteResult:
+        """Build the fallback result of a failed LLM rewrite."""
+        logger.error(f"{self._LLM_REWRITES[rewrite_type].error_message}: {error}")
+        if rewrite_type == "expansion":
+            # Fallback to simple expansion
+            return self._simple_expansion(query)
         
-        expanded_query = query
-        for pattern, replacement in expansions.items():
-            expanded_query = re.sub(pattern, replacement, expanded_query, flags=re.IGNORECASE)
+        return QueryRewriteResult(
+            original_query=query,
+            rewritten_query=query,
+            rewrite_type=rewrite_type,
+            confidence=0.1,
+            metadata={"error": str(error)}
+        )
+    
+    def _simple_expansion(self, query: str) -> QueryRewriteResult:
+        """Simple rule-based query expansion as fallback."""
+        expanded_query = _SIMPLE_EXPANSION_RE.sub(
+            lambda match: _SIMPLE_EXPANSIONS[match.group(0).upper()], query
+        )
         
         return QueryRewriteResult(
             original_query=query,
@@ -217,26 +266,56 @@ class QueryRewriter:
             metadata={"method": "rule_based"}
         )
     
-    def batch_rewrite_queries(self, queries: List[str], rewrite_type: str = "expansion") -> List[QueryRewriteResult]:
-        """Rewrite multiple queries in batch."""
-        results = []
+    def batch_rewrite_queries(
+        self,
+        queries: List[str],
+        rewrite_type: str = "expansion",
+        concurrency: int = 8
+    ) -> List[QueryRewriteResult]:
+        """Rewrite multiple queries in batch, at most concurrency LLM calls at a time."""
+        if not queries:
+            return []
         
-        for query in queries:
+        # Threads over the sync client rather than asyncio.run: the async client's pool is bound
+        # to the loop it first ran on, and this may be called while a loop is already running
+        def rewrite(query: str) -> QueryRewriteResult:
             try:
-                result = self.rewrite_query(query, rewrite_type)
-                results.append(result)
+                return self.rewrite_query(query, rewrite_type)
             except Exception as e:
-                logger.error(f"Failed to rewrite query '{query}': {e}")
-                # Add fallback result
-                results.append(QueryRewriteResult(
-                    original_query=query,
-                    rewritten_query=query,
-                    rewrite_type=rewrite_type,
-                    confidence=0.1,
-                    metadata={"error": str(e)}
-                ))
+                return self._batch_failed(query, rewrite_type, e)
         
-        return results
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(queries))) as pool:
+            return list(pool.map(rewrite, queries))
+    
+    async def batch_rewrite_queries_async(
+        self,
+        queries: List[str],
+        rewrite_type: str = "expansion",
+        concurrency: int = 8
+    ) -> List[QueryRewriteResult]:
+        """Rewrite multiple queries concurrently, at most concurrency LLM calls at a time."""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(query: str) -> QueryRewriteResult:
+            async with semaphore:
+                try:
+                    return await self.arewrite_query(query, rewrite_type)
+                except Exception as e:
+                    return self._batch_failed(query, rewrite_type, e)
+        
+        return await asyncio.gather(*(bounded(query) for query in queries))
+    
+    @staticmethod
+    def _batch_failed(query: str, rewrite_type: str, error: Exception) -> QueryRewriteResult:
+        """Build the fallback result for a query that failed within a batch."""
+        logger.error(f"Failed to rewrite query '{query}': {error}")
+        return QueryRewriteResult(
+            original_query=query,
+            rewritten_query=query,
+            rewrite_type=rewrite_type,
+            confidence=0.1,
+            metadata={"error": str(error)}
+        )
     
     def get_rewrite_suggestions(self, query: str) -> List[str]:
         """Get multiple rewrite suggestions for a query."""
@@ -254,11 +333,4 @@ class QueryRewriter:
                 logger.warning(f"Failed to generate {rewrite_type} suggestion: {e}")
         
         # Remove duplicates while preserving order
-        seen = set()
-        unique_suggestions = []
-        for suggestion in suggestions:
-            if suggestion not in seen:
-                seen.add(suggestion)
-                unique_suggestions.append(suggestion)
-        
-        return unique_suggestions
+        return list(dict.fromkeys(suggestions))
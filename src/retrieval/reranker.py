@@ -3,15 +3,31 @@ Cross-encoder reranking for improved retrieval precision.
 Uses sentence transformers for reranking retrieved documents.
 """
 
+import contextlib
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 import structlog
 from sentence_transformers import CrossEncoder
 import torch
+from ..utils.fs import ensure_dir
 
 logger = structlog.get_logger(__name__)
 
+# Let fp32 matmuls that stay outside autocast use TF32 tensor cores
+torch.backends.cuda.matmul.allow_tf32 = True
+
+# Dynamically quantized int8 export, run with AVX-512 VNNI kernels on CPU
+_QUANTIZED_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
 
 @dataclass
 class RerankResult:
@@ -25,24 +41,237 @@ class RerankResult:
     rank_change: int  # Change in rank position
 
 
+class ScorerCache:
+    """Persistent SQLite cache of cross-encoder scores keyed on (query, chunk_id)."""
+    
+    # Row-value pairs per SELECT; keeps each statement under SQLite's bound-parameter limit
+    lookup_batch = 400
+    
+    # Size eviction runs after this many inserted rows rather than on every write
+    eviction_interval = 1024
+    
+    def __init__(
+        self,
+        path: Union[str, Path],
+        model_name: str = "",
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_entries: Optional[int] = 1_000_000
+    ):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserted_since_eviction = 0
+        
+        ensure_dir(self.path.parent)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "query_hash TEXT, chunk_id TEXT, score REAL, created_at REAL, "
+            "PRIMARY KEY (query_hash, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_created_at ON scores (created_at)")
+        self._conn.commit()
+    
+    def _hash_query(self, query: str) -> str:
+        """Hash a query together with the model name, so models never share scores."""
+        return hashlib.blake2b(f"{self.model_name}\0{query}".encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get_many(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        """Look up cached scores for (query, chunk_id) keys; misses are absent from the result."""
+        hashed = {(self._hash_query(query), chunk_id): (query, chunk_id) for query, chunk_id in dict.fromkeys(keys)}
+        rows = list(hashed)
+        min_created_at = time.time() - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+        
+        found = {}
+        with self._lock:
+            for start in range(0, len(rows), self.lookup_batch):
+                batch = rows[start:start + self.lookup_batch]
+                cursor = self._conn.execute(
+                    "SELECT query_hash, chunk_id, score FROM scores "
+                    f"WHERE (query_hash, chunk_id) IN (VALUES {', '.join(['(?, ?)'] * len(batch))}) "
+                    "AND created_at >= ?",
+                    [value for row in batch for value in row] + [min_created_at]
+                )
+                for query_hash, chunk_id, score in cursor:
+                    found[hashed[(query_hash, chunk_id)]] = score
+        
+        return found
+    
+    def put_many(self, entries: List[Tuple[str, str, float]]):
+        """Store (query, chunk_id, score) entries, replacing any existing ones."""
+        if not entries:
+            return
+        
+        now = time.time()
+        rows = [(self._hash_query(query), chunk_id, score, now) for query, chunk_id, score in entries]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)", rows)
+            self._inserted_since_eviction += len(rows)
+            if self._inserted_since_eviction >= self.eviction_interval:
+                self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now: float):
+        """Drop expired rows, then the oldest rows beyond max_entries; caller holds the lock."""
+        self._inserted_since_eviction = 0
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM scores WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM scores WHERE rowid IN "
+                    "(SELECT rowid FROM scores ORDER BY created_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
 class CrossEncoderReranker:
-    """Cross-encoder reranker for improving retrieval precision."""
+    """Cross-encoder reranker for improving retrieval precision.
+    
+    The default "onnx" backend runs int8-quantized on CPU and unquantized fp32 on GPU.
+    Half precision (bf16/fp16 with autocast) only applies with backend="torch" on CUDA.
+    """
     
     def __init__(
         self, 
         model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        backend: str = "onnx",
+        quantize: bool = True,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        cache_dir: Optional[Union[str, Path]] = None,
+        score_cache: Optional[ScorerCache] = None
     ):
         self.model_name = model_name
+        self.score_cache = score_cache
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.backend = backend
+        # int8 quantization only pays off on CPU; on GPU the ONNX model runs as exported
+        self.quantize = quantize and backend == "onnx" and self.device == "cpu"
+        self.cache_dir = Path(cache_dir or os.getenv("RERANKER_CACHE_DIR", "./data/reranker_cache"))
+        
+        # Half-precision dtype for the PyTorch backend on CUDA; None runs at full precision,
+        # which includes every ONNX run (the default backend)
+        self.half_dtype: Optional[torch.dtype] = None
+        if backend == "torch" and self.device.startswith("cuda"):
+            self.half_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
         
         try:
-            self.model = CrossEncoder(model_name, device=self.device)
-            logger.info(f"Loaded cross-encoder model: {model_name} on {self.device}")
+            self.model = self._load_model(dict(model_kwargs or {}))
+            if self.half_dtype is not None:
+                self.model.model.to(self.half_dtype)
+            logger.info(
+                f"Loaded cross-encoder model: {model_name} on {self.device} "
+                f"({backend}{', int8' if self.quantize else ''})"
+            )
         except Exception as e:
             logger.error(f"Failed to load cross-encoder model: {e}")
             raise
     
+    def _load_model(self, model_kwargs: Dict[str, Any]) -> CrossEncoder:
+        """Load the cross-encoder, exporting the quantized ONNX model on first use."""
+        if not self.quantize:
+            return CrossEncoder(
+                self.model_name,
+                device=self.device,
+                backend=self.backend,
+                model_kwargs=model_kwargs
+            )
+        
+        # The quantized export is saved under the cache dir so later loads skip it
+        model_dir = self.cache_dir / self.model_name.replace("/", "__")
+        if not (model_dir / _QUANTIZED_ONNX_FILE).exists():
+            self._export_quantized_model(model_dir)
+        
+        model_kwargs["file_name"] = _QUANTIZED_ONNX_FILE
+        return CrossEncoder(
+            str(model_dir),
+            device=self.device,
+            backend="onnx",
+            model_kwargs=model_kwargs
+        )
+    
+    def _export_quantized_model(self, model_dir: Path):
+        """Export the quantized ONNX model into model_dir, which appears only once complete."""
+        from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+        
+        # Export beside model_dir and rename it into place, so workers loading concurrently
+        # never see a partial export
+        ensure_dir(self.cache_dir)
+        export_dir = tempfile.mkdtemp(prefix=f".{model_dir.name}.", dir=self.cache_dir)
+        try:
+            model = CrossEncoder(self.model_name, device=self.device, backend="onnx")
+            model.save_pretrained(export_dir)
+            export_dynamic_quantized_onnx_model(model, "avx512_vnni", export_dir)
+            os.replace(export_dir, model_dir)
+        except OSError:
+            # Another worker renamed its export into place first; use that one
+            shutil.rmtree(export_dir, ignore_errors=True)
+            if not (model_dir / _QUANTIZED_ONNX_FILE).exists():
+                raise
+            return
+        except BaseException:
+            shutil.rmtree(export_dir, ignore_errors=True)
+            raise
+        
+        logger.info(f"Exported quantized cross-encoder model to {model_dir}")
+    
+    def _predict(self, pairs: List[Tuple[str, str]], **kwargs) -> np.ndarray:
+        """Score query-document pairs without autograd, under autocast when running in half precision."""
+        autocast = (
+            torch.autocast(device_type="cuda", dtype=self.half_dtype)
+            if self.half_dtype is not None else contextlib.nullcontext()
+        )
+        with torch.inference_mode(), autocast:
+            return self.model.predict(pairs, **kwargs)
+    
+    def _score(self, pairs: List[Tuple[str, str]], chunk_ids: List[Optional[str]], **kwargs) -> np.ndarray:
+        """Score query-document pairs, running the model only on pairs missing from the score cache."""
+        scores = np.empty(len(pairs), dtype=np.float32)
+        misses = range(len(pairs))
+        
+        # Documents without a chunk_id have no stable key and are always scored
+        if self.score_cache is not None:
+            keys = [(query, chunk_id) for (query, _), chunk_id in zip(pairs, chunk_ids) if chunk_id]
+            try:
+                cached = self.score_cache.get_many(keys)
+            except sqlite3.Error as e:
+                # An unreadable cache only costs the model calls it would have saved
+                logger.warning(f"Score cache lookup failed, scoring all pairs: {e}")
+                cached = {}
+            misses = []
+            for i, ((query, _), chunk_id) in enumerate(zip(pairs, chunk_ids)):
+                score = cached.get((query, chunk_id)) if chunk_id else None
+                if score is None:
+                    misses.append(i)
+                else:
+                    scores[i] = score
+        
+        if misses:
+            # Score in length order so each model batch pads to similar lengths
+            order = sorted(misses, key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+            scores[order] = self._predict([pairs[i] for i in order], **kwargs)
+            
+            if self.score_cache is not None:
+                try:
+                    self.score_cache.put_many([
+                        (pairs[i][0], chunk_ids[i], float(scores[i])) for i in order if chunk_ids[i]
+                    ])
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to store scores in the score cache: {e}")
+        
+        return scores
+    
     def rerank(
         self, 
         query: str, 
@@ -58,34 +287,9 @@ class CrossEncoderReranker:
             pairs = [(query, doc['content']) for doc in documents]
             
             # Get rerank scores
-            rerank_scores = self.model.predict(pairs)
+            rerank_scores = self._score(pairs, [doc.get('chunk_id') for doc in documents])
             
-            # Create results with original and rerank scores
-            results = []
-            for i, (doc, score) in enumerate(zip(documents, rerank_scores)):
-                result = RerankResult(
-                    content=doc['content'],
-                    metadata=doc.get('metadata', {}),
-                    original_score=doc.get('similarity_score', 0.0),
-                    rerank_score=float(score),
-                    chunk_id=doc.get('chunk_id', ''),
-                    document_id=doc.get('document_id', ''),
-                    rank_change=0  # Will be calculated after sorting
-                )
-                results.append(result)
-            
-            # Sort by rerank score (descending)
-            results.sort(key=lambda x: x.rerank_score, reverse=True)
-            
-            # Calculate rank changes
-            original_ranks = {doc['chunk_id']: i for i, doc in enumerate(documents)}
-            for i, result in enumerate(results):
-                original_rank = original_ranks.get(result.chunk_id, i)
-                result.rank_change = original_rank - i
-            
-            # Apply top_k filter if specified
-            if top_k is not None:
-                results = results[:top_k]
+            results = self._build_results(documents, rerank_scores, top_k)
             
             logger.info(f"Reranked {len(documents)} documents, top {len(results)} selected")
             return results
@@ -94,6 +298,42 @@ class CrossEncoderReranker:
             logger.error(f"Failed to rerank documents: {e}")
             raise
     
+    def _build_results(
+        self,
+        documents: List[Dict[str, Any]],
+        rerank_scores,
+        top_k: Optional[int] = None
+    ) -> List[RerankResult]:
+        """Rank documents by their cross-encoder scores."""
+        # Create results with original and rerank scores
+        results = []
+        for i, (doc, score) in enumerate(zip(documents, rerank_scores)):
+            result = RerankResult(
+                content=doc['content'],
+                metadata=doc.get('metadata', {}),
+                original_score=doc.get('similarity_score', 0.0),
+                rerank_score=float(score),
+                chunk_id=doc.get('chunk_id', ''),
+                document_id=doc.get('document_id', ''),
+                rank_change=0  # Will be calculated after sorting
+            )
+            results.append(result)
+        
+        # Sort by rerank score (descending)
+        results.sort(key=lambda x: x.rerank_score, reverse=True)
+        
+        # Calculate rank changes
+        original_ranks = {doc['chunk_id']: i for i, doc in enumerate(documents)}
+        for i, result in enumerate(results):
+            original_rank = original_ranks.get(result.chunk_id, i)
+            result.rank_change = original_rank - i
+        
+        # Apply top_k filter if specified
+        if top_k is not None:
+            results = results[:top_k]
+        
+        return results
+    
     def rerank_with_threshold(
         self, 
         query: str, 
@@ -118,15 +358,48 @@ class CrossEncoderReranker:
         if len(queries) != len(documents_list):
             raise ValueError("Number of queries must match number of document lists")
         
-        results = []
+        # Flatten every query's pairs so the model scores them in one predict call
+        all_pairs = []
+        all_chunk_ids = []
+        offsets = [0]
         for query, documents in zip(queries, documents_list):
             try:
-                reranked = self.rerank(query, documents)
-                results.append(reranked)
+                all_pairs.extend((query, doc['content']) for doc in documents)
+                all_chunk_ids.extend(doc.get('chunk_id') for doc in documents)
+            except Exception as e:
+                logger.error(f"Failed to rerank for query '{query}': {e}")
+                del all_pairs[offsets[-1]:]
+                del all_chunk_ids[offsets[-1]:]
+            offsets.append(len(all_pairs))
+        
+        scores = np.empty(len(all_pairs), dtype=np.float32)
+        if all_pairs:
+            try:
+                scores = self._score(
+                    all_pairs,
+                    all_chunk_ids,
+                    batch_size=64,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to rerank {len(queries)} queries: {e}")
+                return [[] for _ in queries]
+        
+        results = []
+        for i, (query, documents) in enumerate(zip(queries, documents_list)):
+            start, end = offsets[i], offsets[i + 1]
+            if end - start != len(documents):
+                # Pairs for this query could not be built; already logged above
+                results.append([])
+                continue
+            try:
+                results.append(self._build_results(documents, scores[start:end]))
             except Exception as e:
                 logger.error(f"Failed to rerank for query '{query}': {e}")
                 results.append([])
         
+        logger.info(f"Batch reranked {len(all_pairs)} documents across {len(queries)} queries")
         return results
     
     def get_relevance_explanation(
@@ -140,7 +413,7 @@ class CrossEncoderReranker:
             # This is a simplified explanation - in practice, you might use
             # attention weights or other interpretability methods
             pairs = [(query, document)]
-            score = self.model.predict(pairs)[0]
+            score = self._predict(pairs)[0]
             
             # Simple explanation based on score
             if score > 0.8:
@@ -162,8 +435,12 @@ class CrossEncoderReranker:
 class HybridReranker:
     """Hybrid reranker that combines multiple reranking strategies."""
     
-    def __init__(self, cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        self.cross_encoder = CrossEncoderReranker(cross_encoder_model)
+    def __init__(
+        self,
+        cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        score_cache: Optional[ScorerCache] = None
+    ):
+        self.cross_encoder = CrossEncoderReranker(cross_encoder_model, score_cache=score_cache)
         self.weights = {
             'original': 0.3,
             'cross_encoder': 0.7
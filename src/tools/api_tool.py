@@ -4,8 +4,9 @@ API calling tool with authentication and rate limiting.
 
 import asyncio
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Optional, Union
 import httpx
+import orjson
 from .base import BaseTool, ToolResult
 import structlog
 
@@ -33,30 +34,53 @@ class APITool(BaseTool):
         self.timeout_seconds = timeout_seconds
         self.rate_limit_per_minute = rate_limit_per_minute
         
-        # Rate limiting
-        self.request_times: List[float] = []
+        # Rate limiting: a token bucket holding up to a minute's worth of requests
+        self._tokens = float(rate_limit_per_minute)
+        self._last_refill = time.monotonic()
         self.rate_limit_lock = asyncio.Lock()
+        
+        # Pooled HTTP/2 client, created on first request and reused until close()
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, creating it on first use."""
+        # base_url and headers are applied per request, since both can change after creation
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the pooled HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Closed API tool HTTP client")
     
     async def _check_rate_limit(self):
         """Check and enforce rate limiting."""
         async with self.rate_limit_lock:
-            now = time.time()
+            capacity = self.rate_limit_per_minute
+            refill_rate = capacity / 60.0
+            now = time.monotonic()
             
-            # Remove old requests (older than 1 minute)
-            self.request_times = [t for t in self.request_times if now - t < 60]
+            # Refill for the time elapsed since the last request
+            self._tokens = min(capacity, self._tokens + (now - self._last_refill) * refill_rate)
+            self._last_refill = now
             
-            # Check if we're at the rate limit
-            if len(self.request_times) >= self.rate_limit_per_minute:
-                # Calculate wait time
-                oldest_request = min(self.request_times)
-                wait_time = 60 - (now - oldest_request)
-                
-                if wait_time > 0:
-                    logger.info(f"Rate limit reached, waiting {wait_time:.2f} seconds")
-                    await asyncio.sleep(wait_time)
+            # Wait until a whole token has accumulated
+            if self._tokens < 1:
+                wait_time = (1 - self._tokens) / refill_rate
+                logger.info(f"Rate limit reached, waiting {wait_time:.2f} seconds")
+                await asyncio.sleep(wait_time)
+                self._tokens = 1.0
+                self._last_refill = now + wait_time
             
-            # Record this request
-            self.request_times.append(now)
+            # Spend a token on this request
+            self._tokens -= 1
     
     def _prepare_headers(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """Prepare headers for the request."""
@@ -94,37 +118,44 @@ class APITool(BaseTool):
             full_url = self._prepare_url(url)
             request_headers = self._prepare_headers(headers)
             
-            # Make request
-            async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-                response = await client.request(
-                    method=method.upper(),
-                    url=full_url,
-                    headers=request_headers,
-                    params=params,
-                    json=json_data,
-                    data=data
-                )
-                
-                # Parse response
-                try:
-                    response_data = response.json()
-                except:
-                    response_data = response.text
-                
-                return ToolResult(
-                    success=response.status_code < 400,
-                    data={
-                        "status_code": response.status_code,
-                        "headers": dict(response.headers),
-                        "data": response_data,
-                        "url": str(response.url)
-                    },
-                    metadata={
-                        "method": method.upper(),
-                        "status_code": response.status_code,
-                        "response_time_ms": 0  # Could be measured
-                    }
-                )
+            # Serialize JSON bodies with orjson; as with httpx, a raw data body takes precedence
+            content = None
+            if json_data is not None and not data:
+                content = orjson.dumps(json_data)
+                if not any(name.lower() == "content-type" for name in request_headers):
+                    request_headers["Content-Type"] = "application/json"
+            
+            # Make request over the pooled connection
+            response = await self._get_client().request(
+                method=method.upper(),
+                url=full_url,
+                headers=request_headers,
+                params=params,
+                content=content,
+                data=data
+            )
+            
+            # Parse response, falling back to text for non-JSON bodies
+            raw = response.content
+            try:
+                response_data = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                response_data = raw.decode(response.encoding or "utf-8", errors="replace")
+            
+            return ToolResult(
+                success=response.status_code < 400,
+                data={
+                    "status_code": response.status_code,
+                    "headers": dict(response.headers),
+                    "data": response_data,
+                    "url": str(response.url)
+                },
+                metadata={
+                    "method": method.upper(),
+                    "status_code": response.status_code,
+                    "response_time_ms": 0  # Could be measured
+                }
+            )
         
         except httpx.TimeoutException:
             return ToolResult(
@@ -166,42 +197,56 @@ class APITool(BaseTool):
             data=data
         )
     
+    # Parameter schema; built once and shared, since it never changes
+    _SCHEMA = {
+        "type": "object",
+        "properties": {
+            "method": {
+                "type": "string",
+                "enum": ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+                "description": "HTTP method"
+            },
+            "url": {
+                "type": "string",
+                "description": "API endpoint URL"
+            },
+            "headers": {
+                "type": "object",
+                "description": "HTTP headers",
+                "additionalProperties": {"type": "string"}
+            },
+            "params": {
+                "type": "object",
+                "description": "Query parameters",
+                "additionalProperties": True
+            },
+            "json_data": {
+                "type": "object",
+                "description": "JSON data to send in request body"
+            },
+            "data": {
+                "type": "string",
+                "description": "Raw data (string or bytes) to send in request body"
+            }
+        },
+        "required": ["method", "url"],
+        "additionalProperties": False
+    }
+    
     def get_schema(self) -> Dict[str, Any]:
         """Get the JSON schema for API tool parameters."""
-        return {
-            "type": "object",
-            "properties": {
-                "method": {
-                    "type": "string",
-                    "enum": ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
-                    "description": "HTTP method"
-                },
-                "url": {
-                    "type": "string",
-                    "description": "API endpoint URL"
-                },
-                "headers": {
-                    "type": "object",
-                    "description": "HTTP headers",
-                    "additionalProperties": {"type": "string"}
-                },
-                "params": {
-                    "type": "object",
-                    "description": "Query parameters",
-                    "additionalProperties": True
-                },
-                "json": {
-                    "type": "object",
-                    "description": "JSON data to send in request body"
-                },
-                "data": {
-                    "type": "string",
-                    "description": "Raw data to send in request body"
-                }
-            },
-            "required": ["method", "url"],
-            "additionalProperties": False
-        }
+        return self._SCHEMA
+    
+    def validate_parameters(self, parameters: Dict[str, Any]) -> bool:
+        """Validate parameters, accepting the method in any case and bytes request bodies."""
+        method = parameters.get("method")
+        if isinstance(method, str) and not method.isupper():
+            # execute() upper-cases the method anyway
+            parameters = {**parameters, "method": method.upper()}
+        if isinstance(parameters.get("data"), (bytes, bytearray)):
+            # JSON Schema has no bytes type; raw bodies from Python callers skip the string check
+            parameters = {k: v for k, v in parameters.items() if k != "data"}
+        return super().validate_parameters(parameters)
     
     async def get(self, url: str, **kwargs) -> ToolResult:
         """Make a GET request."""
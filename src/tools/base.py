@@ -2,9 +2,11 @@
 Base classes for tool implementations.
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
+import fastjsonschema
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -31,6 +33,7 @@ class BaseTool(ABC):
         self.description = description
         self.config = kwargs
         self.logger = structlog.get_logger(name=name)
+        self._validator: Optional[Callable[[Dict[str, Any]], Any]] = None
     
     @abstractmethod
     async def execute(self, **kwargs) -> ToolResult:
@@ -42,17 +45,20 @@ class BaseTool(ABC):
         """Get the JSON schema for tool parameters."""
         pass
     
+    async def close(self):
+        """Release resources held by the tool; a no-op unless the tool holds connections."""
+    
     def validate_parameters(self, parameters: Dict[str, Any]) -> bool:
         """Validate tool parameters against schema."""
         try:
-            schema = self.get_schema()
-            # Basic validation - in practice, you'd use jsonschema
-            required_params = schema.get('required', [])
-            for param in required_params:
-                if param not in parameters:
-                    self.logger.error(f"Missing required parameter: {param}")
-                    return False
+            # Compiled on first use, since subclasses finish setting up after BaseTool.__init__
+            if self._validator is None:
+                self._validator = fastjsonschema.compile(self.get_schema())
+            self._validator(parameters)
             return True
+        except fastjsonschema.JsonSchemaValueException as e:
+            self.logger.error(f"Invalid parameters: {e.message}")
+            return False
         except Exception as e:
             self.logger.error(f"Parameter validation failed: {e}")
             return False
@@ -92,7 +98,7 @@ class ToolRegistry:
             for name, tool in self.tools.items()
         }
     
-    def execute_tool(self, name: str, **kwargs) -> ToolResult:
+    async def execute_tool(self, name: str, **kwargs) -> ToolResult:
         """Execute a tool by name."""
         tool = self.get_tool(name)
         if not tool:
@@ -110,7 +116,7 @@ class ToolRegistry:
                     error=f"Invalid parameters for tool '{name}'"
                 )
             
-            return tool.execute(**kwargs)
+            return await tool.execute(**kwargs)
         
         except Exception as e:
             logger.error(f"Tool execution failed for '{name}': {e}")
@@ -119,6 +125,11 @@ class ToolRegistry:
                 data=None,
                 error=str(e)
             )
+    
+    async def execute_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[ToolResult]:
+        """Execute (name, parameters) tool calls concurrently, returning results in call order."""
+        # execute_tool turns failures into ToolResults, so one failed call never cancels the rest
+        return await asyncio.gather(*(self.execute_tool(name, **params) for name, params in calls))
 
 
 # Global tool registry
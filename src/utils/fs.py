@@ -0,0 +1,14 @@
+"""
+Filesystem helpers.
+"""
+
+import os
+from pathlib import Path
+
+
+def ensure_dir(path: Path):
+    """Create a directory if missing; an existing one costs a single stat."""
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        path.mkdir(parents=True, exist_ok=True)
@@ -3,12 +3,36 @@ Token counting and budgeting utilities.
 """
 
 import tiktoken
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional
 import structlog
 
 logger = structlog.get_logger(__name__)
 
 
+class UsageScope:
+    """Token usage recorded inside one TokenCounter.scope() block."""
+    
+    __slots__ = ("usage", "parent")
+    
+    def __init__(self, parent: Optional["UsageScope"] = None):
+        self.parent = parent
+        self.usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        }
+    
+    def get_usage(self) -> Dict[str, int]:
+        """Get token usage for this scope."""
+        return self.usage.copy()
+
+
+# Innermost active scope; asyncio tasks inherit it, so concurrent executions stay isolated
+_current_scope: ContextVar[Optional[UsageScope]] = ContextVar("token_usage_scope", default=None)
+
+
 class TokenCounter:
     """Utility for counting tokens and managing budgets."""
     
@@ -30,10 +54,27 @@ class TokenCounter:
         return [self.count_tokens(text) for text in texts]
     
     def add_usage(self, prompt_tokens: int, completion_tokens: int):
-        """Add token usage to the counter."""
+        """Add token usage to the counter and every enclosing scope."""
         self.usage["prompt_tokens"] += prompt_tokens
         self.usage["completion_tokens"] += completion_tokens
         self.usage["total_tokens"] += prompt_tokens + completion_tokens
+        
+        scope = _current_scope.get()
+        while scope is not None:
+            scope.usage["prompt_tokens"] += prompt_tokens
+            scope.usage["completion_tokens"] += completion_tokens
+            scope.usage["total_tokens"] += prompt_tokens + completion_tokens
+            scope = scope.parent
+    
+    @contextmanager
+    def scope(self) -> Iterator[UsageScope]:
+        """Track token usage for one unit of work, such as a single execution."""
+        usage_scope = UsageScope(parent=_current_scope.get())
+        token = _current_scope.set(usage_scope)
+        try:
+            yield usage_scope
+        finally:
+            _current_scope.reset(token)
     
     def get_usage(self) -> Dict[str, int]:
         """Get current token usage."""
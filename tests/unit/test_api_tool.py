@@ -0,0 +1,88 @@
+"""
+Unit tests for API tool.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+
+pytest.importorskip("fastjsonschema")
+
+from src.tools.api_tool import APITool
+
+
+class TestAPIToolRateLimit:
+    """Test cases for APITool's token-bucket rate limiter."""
+    
+    def setup_method(self):
+        """Setup a fake clock that asyncio.sleep advances."""
+        self.now = 1000.0
+        self.sleeps = []
+        
+        async def fake_sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+        
+        self.patches = [
+            patch("src.tools.api_tool.time.monotonic", side_effect=lambda: self.now),
+            patch("src.tools.api_tool.asyncio.sleep", side_effect=fake_sleep)
+        ]
+        for p in self.patches:
+            p.start()
+        self.api_tool = APITool(rate_limit_per_minute=60)
+    
+    def teardown_method(self):
+        """Remove the clock patches."""
+        for p in self.patches:
+            p.stop()
+    
+    async def _acquire(self, count):
+        """Take count tokens from the bucket, one request at a time."""
+        for _ in range(count):
+            await self.api_tool._check_rate_limit()
+    
+    def test_full_bucket_allows_burst(self):
+        """Test a full bucket admits a minute's worth of requests without waiting."""
+        asyncio.run(self._acquire(60))
+        assert self.sleeps == []
+    
+    def test_empty_bucket_waits_for_one_token(self):
+        """Test requests past the burst wait one refill interval each."""
+        asyncio.run(self._acquire(62))
+        assert self.sleeps == [pytest.approx(1.0), pytest.approx(1.0)]
+    
+    def test_idle_time_refills_bucket(self):
+        """Test tokens refill at the per-minute rate while idle, up to capacity."""
+        asyncio.run(self._acquire(60))
+        self.now += 30
+        asyncio.run(self._acquire(30))
+        assert self.sleeps == []
+        
+        asyncio.run(self._acquire(1))
+        assert self.sleeps == [pytest.approx(1.0)]
+        
+        # A long idle spell never banks more than a full bucket
+        self.now += 3600
+        asyncio.run(self._acquire(61))
+        assert self.sleeps == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+class TestAPIToolValidation:
+    """Test cases for APITool parameter validation."""
+    
+    def setup_method(self):
+        """Setup test environment."""
+        self.api_tool = APITool()
+    
+    def test_method_is_case_insensitive(self):
+        """Test lowercase methods validate, and unknown methods still don't."""
+        assert self.api_tool.validate_parameters({"method": "get", "url": "https://example.com"})
+        assert self.api_tool.validate_parameters({"method": "Post", "url": "https://example.com"})
+        assert not self.api_tool.validate_parameters({"method": "fetch", "url": "https://example.com"})
+    
+    def test_data_accepts_str_and_bytes(self):
+        """Test raw bodies may be str or bytes, but not other types."""
+        url = "https://example.com"
+        assert self.api_tool.validate_parameters({"method": "POST", "url": url, "data": "a=1"})
+        assert self.api_tool.validate_parameters({"method": "POST", "url": url, "data": b"\x00\x01"})
+        assert not self.api_tool.validate_parameters({"method": "POST", "url": url, "data": 1})
@@ -76,6 +76,25 @@ class TestConfigLoader:
         assert loaded_config.model == "gpt-4"
         assert len(loaded_config.tools) == 2
     
+    def test_load_workflow_cache(self):
+        """Test parsed workflows are cached until invalidated."""
+        workflow_config = {
+            "name": "cached_workflow",
+            "description": "Cached workflow",
+            "workflow_type": "rag_chain",
+            "steps": [{"name": "retrieve", "type": "retrieval"}]
+        }
+        
+        workflow_file = Path(self.temp_dir) / "workflows" / "cached_workflow.yaml"
+        with open(workflow_file, 'w') as f:
+            yaml.dump(workflow_config, f)
+        
+        first = self.config_loader.load_workflow("cached_workflow")
+        assert self.config_loader.load_workflow("cached_workflow") is first
+        
+        self.config_loader.invalidate(workflow_id="cached_workflow")
+        assert self.config_loader.load_workflow("cached_workflow") is not first
+    
     def test_environment_variable_substitution(self):
         """Test environment variable substitution."""
         import os
@@ -89,16 +108,53 @@ class TestConfigLoader:
             "description": "Test with ${TEST_VAR}",
             "version": "1.0.0",
             "workflow_type": "rag_chain",
-            "steps": []
+            "steps": [{"name": "retrieve", "type": "retrieval"}]
         }
         
+        workflow_file = Path(self.temp_dir) / "workflows" / "test.yaml"
+        with open(workflow_file, 'w') as f:
+            yaml.dump(config, f)
+        
         # Test substitution
-        substituted = self.config_loader._substitute_env_vars(config)
-        assert substituted["description"] == "Test with test_value"
+        substituted = self.config_loader.load_workflow("test")
+        assert substituted.description == "Test with test_value"
         
         # Cleanup
         del os.environ["TEST_VAR"]
     
+    def test_environment_variable_substitution_rules(self):
+        """Test whole and embedded references in values are substituted, unset ones and keys are not."""
+        import os
+        
+        os.environ["TEST_HOST"] = "db.internal"
+        os.environ.pop("TEST_UNSET_VAR", None)
+        
+        workflow_file = Path(self.temp_dir) / "workflows" / "env_rules.yaml"
+        with open(workflow_file, 'w') as f:
+            f.write(
+                "name: env_rules\n"
+                "description: ${TEST_HOST}\n"
+                "workflow_type: rag_chain\n"
+                "steps:\n"
+                "  - name: retrieve\n"
+                "    type: retrieval\n"
+                "    config:\n"
+                "      url: postgres://${TEST_HOST}/app\n"
+                "      token: ${TEST_UNSET_VAR}\n"
+                "      ${TEST_HOST}: key\n"
+            )
+        
+        try:
+            loaded_config = self.config_loader.load_workflow("env_rules")
+        finally:
+            del os.environ["TEST_HOST"]
+        
+        step_config = loaded_config.steps[0].config
+        assert loaded_config.description == "db.internal"
+        assert step_config["url"] == "postgres://db.internal/app"
+        assert step_config["token"] == "${TEST_UNSET_VAR}"
+        assert step_config["${TEST_HOST}"] == "key"
+    
     def test_validate_config(self):
         """Test configuration validation."""
         # Valid workflow config
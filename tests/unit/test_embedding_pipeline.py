@@ -0,0 +1,90 @@
+"""
+Unit tests for document chunking.
+"""
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("redis")
+pytest.importorskip("tiktoken")
+pytest.importorskip("tenacity")
+
+from src.embeddings.embedding_pipeline import DocumentChunker
+
+
+class TestDocumentChunker:
+    """Test cases for DocumentChunker."""
+    
+    def setup_method(self):
+        """Setup test environment."""
+        self.chunker = DocumentChunker(chunk_size=10, chunk_overlap=3)
+        self.encoding = self.chunker.encoding
+    
+    def _text_of(self, n_tokens, word=" token"):
+        """Build a text that tokenizes to exactly n_tokens tokens."""
+        tokens = self.encoding.encode_ordinary(word * (n_tokens + 10))[:n_tokens]
+        text = self.encoding.decode(tokens)
+        assert len(self.encoding.encode_ordinary(text)) == n_tokens
+        return text
+    
+    def _expected(self, text, chunker):
+        """Chunk texts computed by decoding each chunk's tokens."""
+        tokens = self.encoding.encode_ordinary(text)
+        step = chunker.chunk_size - chunker.chunk_overlap
+        expected = []
+        for start in range(0, len(tokens), step):
+            expected.append(self.encoding.decode(tokens[start:start + chunker.chunk_size]))
+            if start + chunker.chunk_size >= len(tokens):
+                break
+        return expected
+    
+    def test_empty_document(self):
+        """Test an empty document produces no chunks."""
+        assert self.chunker.chunk_document("", "doc") == []
+    
+    def test_shorter_than_chunk_size(self):
+        """Test a document under chunk_size tokens is a single chunk."""
+        text = self._text_of(7)
+        chunks = self.chunker.chunk_document(text, "doc")
+        
+        assert [c.content for c in chunks] == [text]
+        assert chunks[0].metadata["chunk_size"] == 7
+        assert chunks[0].metadata["chunk_overlap"] == 0
+        assert chunks[0].metadata["total_chunks"] == 1
+    
+    def test_exactly_chunk_size(self):
+        """Test a document of exactly chunk_size tokens is a single chunk."""
+        text = self._text_of(10)
+        chunks = self.chunker.chunk_document(text, "doc")
+        
+        assert [c.content for c in chunks] == [text]
+        assert chunks[0].metadata["chunk_size"] == 10
+    
+    def test_one_token_over_chunk_size(self):
+        """Test one token past chunk_size starts a second, overlapping chunk."""
+        text = self._text_of(11)
+        chunks = self.chunker.chunk_document(text, "doc")
+        
+        assert [c.content for c in chunks] == self._expected(text, self.chunker)
+        assert [c.metadata["chunk_size"] for c in chunks] == [10, 4]
+        assert [c.metadata["chunk_overlap"] for c in chunks] == [0, 3]
+        assert [c.metadata["total_chunks"] for c in chunks] == [2, 2]
+        assert [c.chunk_index for c in chunks] == [0, 1]
+        assert len({c.chunk_id for c in chunks}) == 2
+    
+    def test_zero_overlap_partitions_text(self):
+        """Test chunks without overlap tile the document exactly."""
+        chunker = DocumentChunker(chunk_size=10, chunk_overlap=0)
+        text = self._text_of(25)
+        chunks = chunker.chunk_document(text, "doc")
+        
+        assert [c.metadata["chunk_size"] for c in chunks] == [10, 10, 5]
+        assert "".join(c.content for c in chunks) == text
+    
+    def test_multibyte_text_matches_token_decode(self):
+        """Test chunks cut inside multi-byte characters match decoding the chunk's tokens."""
+        chunker = DocumentChunker(chunk_size=5, chunk_overlap=2)
+        text = "héllo wörld 你好世界 🙂🚀 naïve café " * 3
+        chunks = chunker.chunk_document(text, "doc")
+        
+        assert [c.content for c in chunks] == self._expected(text, chunker)
@@ -0,0 +1,53 @@
+"""
+Unit tests for prompt manager.
+"""
+
+import tempfile
+from src.core.prompt_manager import PromptManager
+
+
+class TestPromptManager:
+    """Test cases for PromptManager."""
+    
+    def setup_method(self):
+        """Setup test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.prompt_manager = PromptManager(self.temp_dir)
+    
+    def test_render_cache_reuses_equal_context(self):
+        """Test repeated renders with the same scalar context are served from the cache."""
+        self.prompt_manager.create_template("user", "greeting", "Hello {{ name }}")
+        
+        assert self.prompt_manager.get_user_prompt("greeting", name="Ada") == "Hello Ada"
+        assert self.prompt_manager.get_user_prompt("greeting", name="Ada") == "Hello Ada"
+        assert len(self.prompt_manager._render_cache) == 1
+    
+    def test_render_cache_distinguishes_value_types(self):
+        """Test 1, 1.0 and True don't share a cached render although they compare equal."""
+        self.prompt_manager.create_template("user", "value", "value={{ x }}")
+        
+        assert self.prompt_manager.get_user_prompt("value", x=1) == "value=1"
+        assert self.prompt_manager.get_user_prompt("value", x=True) == "value=True"
+        assert self.prompt_manager.get_user_prompt("value", x=1.0) == "value=1.0"
+    
+    def test_updated_template_is_rerendered(self):
+        """Test a template updated on disk replaces its cached renders."""
+        self.prompt_manager.create_template("system", "role", "v1 {{ x }}")
+        assert self.prompt_manager.get_system_prompt("role", x=1) == "v1 1"
+        
+        self.prompt_manager.update_template("system", "role", "v2 {{ x }}")
+        assert self.prompt_manager.get_system_prompt("role", x=1) == "v2 1"
+    
+    def test_template_changed_by_another_worker_is_rerendered(self):
+        """Test a template rewritten on disk outside this manager is reloaded on the next render."""
+        import os
+        import time
+        
+        self.prompt_manager.create_template("user", "shared", "v1 {{ x }}")
+        assert self.prompt_manager.get_user_prompt("shared", x=1) == "v1 1"
+        
+        template_path = self.prompt_manager.get_template_path("user", "shared")
+        template_path.write_text("v2 {{ x }}")
+        later = time.time() + 5
+        os.utime(template_path, (later, later))
+        assert self.prompt_manager.get_user_prompt("shared", x=1) == "v2 1"
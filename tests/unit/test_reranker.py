@@ -0,0 +1,94 @@
+"""
+Unit tests for reranker score caching.
+"""
+
+import pytest
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from src.retrieval.reranker import CrossEncoderReranker, ScorerCache
+
+
+class _RecordingModel:
+    """Scores pairs by document length and records what it was asked to score."""
+    
+    def __init__(self):
+        self.scored = []
+    
+    def predict(self, pairs, **kwargs):
+        self.scored.extend(pairs)
+        return [len(document) / 100 for _, document in pairs]
+
+
+class TestScorerCache:
+    """Test cases for ScorerCache and its use by CrossEncoderReranker."""
+    
+    def setup_method(self):
+        """Setup test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ScorerCache(Path(self.temp_dir) / "scores.db", model_name="test-model")
+        
+        # Skip model loading; only the scoring path is under test
+        self.model = _RecordingModel()
+        self.reranker = CrossEncoderReranker.__new__(CrossEncoderReranker)
+        self.reranker.model = self.model
+        self.reranker.half_dtype = None
+        self.reranker.score_cache = self.cache
+    
+    def teardown_method(self):
+        """Close the cache database."""
+        self.cache.close()
+    
+    def test_only_misses_are_scored(self):
+        """Test cached pairs are served from the cache and only the rest reach the model."""
+        self.cache.put_many([("query", "a", 0.9)])
+        
+        scores = self.reranker._score(
+            [("query", "doc a"), ("query", "doc bb"), ("query", "doc ccc")],
+            ["a", "b", None]
+        )
+        
+        assert scores.tolist() == pytest.approx([0.9, 0.06, 0.07])
+        assert self.model.scored == [("query", "doc bb"), ("query", "doc ccc")]
+        
+        # The keyed miss was stored; the pair without a chunk_id was not
+        assert self.cache.get_many([("query", "b"), ("query", "")]) == {("query", "b"): pytest.approx(0.06)}
+    
+    def test_expired_scores_are_misses(self):
+        """Test scores older than the TTL are not returned."""
+        cache = ScorerCache(Path(self.temp_dir) / "ttl.db", ttl_seconds=60)
+        with patch("src.retrieval.reranker.time.time", return_value=1000.0):
+            cache.put_many([("query", "a", 0.5)])
+        
+        with patch("src.retrieval.reranker.time.time", return_value=1059.0):
+            assert cache.get_many([("query", "a")]) == {("query", "a"): 0.5}
+        with patch("src.retrieval.reranker.time.time", return_value=1061.0):
+            assert cache.get_many([("query", "a")]) == {}
+        cache.close()
+    
+    def test_eviction_keeps_newest_entries(self):
+        """Test eviction drops the oldest rows beyond max_entries."""
+        cache = ScorerCache(Path(self.temp_dir) / "evict.db", ttl_seconds=None, max_entries=2)
+        cache.eviction_interval = 1
+        for i, chunk_id in enumerate(["a", "b", "c"]):
+            with patch("src.retrieval.reranker.time.time", return_value=1000.0 + i):
+                cache.put_many([("query", chunk_id, float(i))])
+        
+        assert cache.get_many([("query", "a"), ("query", "b"), ("query", "c")]) == {
+            ("query", "b"): 1.0,
+            ("query", "c"): 2.0
+        }
+        cache.close()
+    
+    def test_cache_errors_fall_back_to_scoring(self):
+        """Test an unusable cache degrades to scoring every pair."""
+        self.cache.close()
+        
+        scores = self.reranker._score([("query", "doc a"), ("query", "doc bb")], ["a", "b"])
+        
+        assert scores.tolist() == pytest.approx([0.05, 0.06])
+        assert len(self.model.scored) == 2